@@ -125,11 +125,7 @@ class DefaultBacktester(Backtester):
         self.portfolio = portfolio
 
     def run(self, market: Market, start=None, end=None):
-        for date in market.get_dates():
-            if start is not None and pd.to_datetime(date) < start:
-                continue
-            if end is not None and pd.to_datetime(date) > end:
-                break
+        for date in market.get_dates(start=start, end=end):
             symbols = market.get_symbols(date)
             self.portfolio.update(date, symbols)
         return self.portfolio.equity_curve
@@ -39,7 +39,7 @@ class DefaultEquityCurve(EquityCurve):
             lambda d: -(d.max()-d[-1]))
         self.df[EquityCurveKey.DRAWDOWN_PERCENT.value] = self.df[EquityCurveKey.EQUITY.value].expanding(1).apply(
             lambda d: -(100 * (d.max()-d[-1]) / d.max()))
-        self.df = utils.round_df(self.df)
+        self.df = utils.round_df(self.df, stage=utils.RoundingStage.EQUITY_CURVE)
 
     def get_dates(self):
         return pd.to_datetime(self.df.index.values)
@@ -72,4 +72,5 @@ class DefaultEquityCurve(EquityCurve):
 
     def save_to_file(self, dir_path):
         utils.makedirs(dir_path)
-        self.df.to_csv(dir_path / 'equity_curve.csv')
+        df = utils.round_df(self.df, stage=utils.RoundingStage.EQUITY_CURVE, output=True)
+        df.to_csv(dir_path / 'equity_curve.csv')
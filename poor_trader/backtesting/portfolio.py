@@ -57,7 +57,7 @@ class DefaultPortfolio(Portfolio):
             self.account.buying_power = self.account.cash
 
     def open(self, date, symbol, tags):
-        price = self.market.get_close(date, symbol)
+        price = self.market.snapshot(date).get_close(symbol)
         shares = self.position_sizing.calculate_shares(date=date, symbol=symbol, account=self.account)
         if self.equity_curve.get_last_drawdown_percent() < -5.0:
             shares = self.position_sizing.calculate_shares(date=date, symbol=symbol, account=self.account,
@@ -83,8 +83,9 @@ class DefaultPortfolio(Portfolio):
                     break
 
     def update_open_positions_values(self, date):
+        snapshot = self.market.snapshot(date)
         for position in self.position_service.get_open_positions():
-            price = self.market.get_close(date=date, symbol=position.symbol)
+            price = snapshot.get_close(position.symbol)
             try:
                 if not pd.isnull(price):
                     position.price = price
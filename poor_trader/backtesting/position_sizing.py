@@ -15,7 +15,7 @@ class FixedFractional(PositionSizing):
         self.unit_risk = unit_risk
 
     def calculate_shares(self, date, symbol, account, use_boardlot=True, base_value=None):
-        price = self.market.get_close(date, symbol)
+        price = self.market.snapshot(date).get_close(symbol)
         C = account.equity * self.total_risk_pct
         if base_value is not None:
             C = base_value * self.total_risk_pct
@@ -51,7 +51,7 @@ class ATRBased(PositionSizing):
         return self.atr_indicator.get_attribute_value(date=date, symbol=symbol, key='ATR')
 
     def calculate_shares(self, date, symbol, account, use_boardlot=True):
-        price = self.market.get_close(date, symbol)
+        price = self.market.snapshot(date).get_close(symbol)
         atr = self.atr(date, symbol)
         normal_atr = self.normalized_atr(date, symbol)
         C = account.equity * self.total_risk_pct
@@ -77,7 +77,7 @@ class RiskedBased(PositionSizing):
         self.unit_risk = unit_risk
 
     def calculate_shares(self, date, symbol, account, use_boardlot=True):
-        price = self.market.get_close(date, symbol)
+        price = self.market.snapshot(date).get_close(symbol)
         C = account.equity * self.total_risk_pct
         #C = C / (40 * price)
         R = price * self.unit_risk
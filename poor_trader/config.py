@@ -36,6 +36,30 @@ EQUITY_CURVE_FILENAME = 'equity_curve.csv'
 
 TRANSACTIONS_FILENAME = 'transactions.csv'
 
+MARKET_METADATA_FILENAME = 'metadata.json'
+
+MARKET_DATA_EXTENSION = 'bin'
+
+MARKET_CALENDAR_FILENAME = 'calendar.pkl'
+
+MARKET_SOURCE_FILENAME = 'source.json'
+
+INDICATOR_PANEL_NAME = 'panel'
+
+INDICATOR_MEMORY_CACHE_SIZE = 512
+
+INDICATOR_MANIFEST_FILENAME = 'manifest.json'
+
+INDICATOR_STORE_FILENAME = 'results.bin'
+
+INDICATOR_STORE_INDEX_FILENAME = 'results.json'
+
+INDICATOR_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+ROUNDING_PLACES = {'Indicator': 4, 'EquityCurve': 4, 'Performance': 2}
+
+ROUND_ON_OUTPUT_ONLY = False
+
 USER_APP_DIR_PATH = Path(os.path.expanduser('~/' + APP_DIR_NAME))
 
 
@@ -9,12 +9,14 @@ from poor_trader.backtesting.entity import Account
 from poor_trader.backtesting.equity_curve import DefaultEquityCurve
 from poor_trader.backtesting.portfolio import DefaultPortfolio
 from poor_trader.backtesting.position_sizing import FixedFractional, ATRBased, RiskedBased
-from poor_trader.market import pkl_to_market
+from poor_trader.market import update_symbol_files, symbol_files_to_market
 from poor_trader.screening import strategy
 from poor_trader.screening.indicator import DefaultIndicatorFactory
+from poor_trader.screening.planner import IndicatorPlanner
 
 INDICATORS_PATH = config.TEMP_PATH / 'indicators'
 HISTORICAL_DATA_PATH = config.RESOURCES_PATH / 'historical_data.pkl'
+SYMBOL_FILES_PATH = config.TEMP_PATH / 'historical_data'
 
 symbols = ['ALI', 'AC',    'MBT', 'SM',    'SMPH', 'JFC',   'URC',   'MPI', 'ICT',  'BLOOM',
            'BPI', 'NOW',   'TEL', 'GTCAP', 'VITA', 'JGS',   'SECB',  'MER', 'AGI',  'HOUSE',
@@ -41,10 +43,14 @@ starting_balance = 15000
 
 broker = PSEDefaultBroker()
 
-market = pkl_to_market('PSE', HISTORICAL_DATA_PATH, symbols=symbols)
+update_symbol_files(HISTORICAL_DATA_PATH, SYMBOL_FILES_PATH)
+
+market = symbol_files_to_market('PSE', SYMBOL_FILES_PATH, symbols=symbols)
 
 factory = DefaultIndicatorFactory(INDICATORS_PATH, market)
 
+planner = IndicatorPlanner(factory)
+
 position_sizing = FixedFractional(market)
 
 # position_sizing = ATRBased(market, factory)
@@ -53,10 +59,10 @@ position_sizing = FixedFractional(market)
 
 save_dir_path = config.USER_APP_DIR_PATH / 'investa'
 
-dc = strategy.DonchianChannel(factory, 50, 50, fast=40, slow=100)
-# dc = strategy.DonchianChannel(factory)
-atr = strategy.ATRChannelBreakout(factory, sma=20, fast=40, slow=100)
-ts = strategy.TrendStrength(factory, fast=40, slow=100)
+dc = strategy.DonchianChannel(planner, 50, 50, fast=40, slow=100)
+# dc = strategy.DonchianChannel(planner)
+atr = strategy.ATRChannelBreakout(planner, sma=20, fast=40, slow=100)
+ts = strategy.TrendStrength(planner, fast=40, slow=100)
 stop_price = strategy.StopPriceStrategy()
 
 dc_portfolio = DefaultPortfolio(account=Account(starting_balance),
@@ -114,6 +120,9 @@ if __name__ == '__main__':
     if os.path.exists(save_dir_path):
         shutil.rmtree(save_dir_path)
 
+    print(planner.report())
+    planner.execute()
+
     portfolios = [dc_portfolio, atr_portfolio, ts_portfolio, default_portfolio]
     for p in portfolios:
         p.print_details()
@@ -1,11 +1,72 @@
 import abc
-import datetime
+import collections
+import json
+import multiprocessing
 import os
 import traceback
 
+import numpy as np
 import pandas as pd
+from dateutil import tz
+from path import Path
 
-from poor_trader import config
+from poor_trader import config, utils
+
+
+COMPACT_DTYPES = {'Open': np.float32, 'High': np.float32, 'Low': np.float32, 'Close': np.float32,
+                  'Volume': np.int64, 'BoardLot': np.int32}
+
+SNAPSHOT_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+SNAPSHOT_CACHE_SIZE = 8
+
+LAZY_MARKET_CACHE_SIZE = 128
+
+
+class Snapshot(object):
+    """
+    Bars of every symbol trading on one date as aligned arrays, e.g. close[i] is the close of symbols[i].
+    """
+
+    def __init__(self, date, symbols, open, high, low, close, volume):
+        self.date = date
+        self.symbols = list(symbols)
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.__positions__ = {symbol: position for position, symbol in enumerate(self.symbols)}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.__positions__
+
+    def get_position(self, symbol):
+        return self.__positions__.get(symbol)
+
+    def get_value(self, field, symbol):
+        position = self.__positions__.get(symbol)
+        if position is None:
+            return np.nan
+        return getattr(self, field.lower())[position]
+
+    def get_open(self, symbol):
+        return self.get_value('Open', symbol)
+
+    def get_high(self, symbol):
+        return self.get_value('High', symbol)
+
+    def get_low(self, symbol):
+        return self.get_value('Low', symbol)
+
+    def get_close(self, symbol):
+        return self.get_value('Close', symbol)
+
+    def get_volume(self, symbol):
+        return self.get_value('Volume', symbol)
 
 
 class Market(object):
@@ -14,6 +75,38 @@ class Market(object):
     def __init__(self, symbols, name='Market'):
         self.name = name
         self.__symbols__ = symbols
+        self.__snapshots__ = collections.OrderedDict()
+        self.__resampled__ = dict()
+
+    def snapshot(self, date):
+        """
+        Returns the Snapshot of all symbols' bars on date. The most recent SNAPSHOT_CACHE_SIZE snapshots are
+        kept, so the portfolio and position sizing can share one per simulated day.
+        """
+        date = pd.Timestamp(date)
+        if date in self.__snapshots__:
+            self.__snapshots__.move_to_end(date)
+            return self.__snapshots__[date]
+        snapshot = self.__create_snapshot__(date)
+        self.__snapshots__[date] = snapshot
+        if len(self.__snapshots__) > SNAPSHOT_CACHE_SIZE:
+            self.__snapshots__.popitem(last=False)
+        return snapshot
+
+    def __create_snapshot__(self, date):
+        raise NotImplementedError
+
+    def resample(self, rule):
+        """
+        Returns a market of bars aggregated to a pandas offset alias, e.g. 'W', 'M' or '4H'. Each timeframe is
+        built once and cached until bars are appended.
+        """
+        if rule not in self.__resampled__:
+            self.__resampled__[rule] = self.__resample__(rule)
+        return self.__resampled__[rule]
+
+    def __resample__(self, rule):
+        raise NotImplementedError
 
     @abc.abstractmethod
     def get_dates(self, symbols=None, start=None, end=None):
@@ -47,36 +140,134 @@ class Market(object):
     def get_quotes(self, date=None, symbol=None, start=None, end=None):
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def trim(self, start=None, end=None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_calendar(self):
+        raise NotImplementedError
+
+
+class TradingCalendar(object):
+    """
+    Sorted trading dates plus a (date, symbol) availability bitmap telling which symbols have a bar on each date.
+    Single dates resolve through a date->row map and date ranges through a binary search.
+    """
+
+    def __init__(self, dates, columns, available):
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = list(columns)
+        self.available = available
+        self.__date_rows__ = {date: row for row, date in enumerate(self.dates.values)}
+        self.__symbol_columns__ = {symbol: column for column, symbol in enumerate(self.columns)}
+        self.__columns_array__ = np.array(self.columns, dtype=object)
+
+    def get_row(self, date):
+        return self.__date_rows__.get(pd.Timestamp(date).to_datetime64())
+
+    def get_column(self, symbol):
+        return self.__symbol_columns__.get(symbol)
+
+    def get_rows(self, date=None, start=None, end=None):
+        if date is not None:
+            row = self.get_row(date)
+            if row is not None:
+                return slice(row, row + 1)
+            start, end = date, date
+        rows = self.dates.slice_indexer(_slice_bound(start), _slice_bound(end))
+        lo = 0 if rows.start is None else int(rows.start)
+        hi = len(self.dates) if rows.stop is None else int(rows.stop)
+        return slice(lo, max(lo, hi))
+
+    def get_dates(self, symbols=None, start=None, end=None):
+        rows = self.get_rows(start=start, end=end)
+        available = self.available[rows]
+        if symbols is not None:
+            available = available[:, [self.__symbol_columns__[_] for _ in symbols if _ in self.__symbol_columns__]]
+        return self.dates[rows][available.any(axis=1)].values
+
+    def get_symbols(self, date=None):
+        if date is None:
+            return list(self.columns)
+        return list(self.__columns_array__[self.available[self.get_rows(date=date)].any(axis=0)])
+
+    def trim(self, start=None, end=None):
+        rows = self.get_rows(start=start, end=end)
+        return TradingCalendar(self.dates[rows], self.columns, self.available[rows])
+
+
+def _slice_bound(bound):
+    """
+    Date strings keep DatetimeIndex partial-string semantics, e.g. '2018-01-02' covers the whole day of
+    intraday bars, while other bounds are compared as exact timestamps.
+    """
+    if bound is None or isinstance(bound, str):
+        return bound
+    return pd.Timestamp(bound)
+
+
+def df_to_calendar(df_historical_data, suffix='_Date'):
+    df_dates = df_historical_data.filter(like=suffix)
+    if not df_dates.index.is_monotonic_increasing:
+        df_dates = df_dates.sort_index()
+    return TradingCalendar(pd.to_datetime(df_dates.index), [_[:-len(suffix)] for _ in df_dates.columns],
+                           pd.notnull(df_dates).values)
+
+
+def _with_date_columns(df_bars):
+    """
+    df_bars with a SYMBOL_Date column added for each symbol without one, holding the bar date where all of the
+    symbol's fields are set, the bars df_to_panel treats as available.
+    """
+    symbol_columns = collections.OrderedDict()
+    for col in df_bars.columns:
+        symbol_columns.setdefault(col.rsplit('_', 1)[0], []).append(col)
+    if all('{}_Date'.format(symbol) in cols for symbol, cols in symbol_columns.items()):
+        return df_bars
+    dates = pd.Series(pd.to_datetime(df_bars.index), index=df_bars.index)
+    df_columns = collections.OrderedDict()
+    for symbol, cols in symbol_columns.items():
+        date_column = '{}_Date'.format(symbol)
+        if date_column not in cols:
+            df_columns[date_column] = dates.where(df_bars[cols].notnull().all(axis=1))
+        for col in cols:
+            df_columns[col] = df_bars[col]
+    return pd.DataFrame(df_columns, index=df_bars.index, columns=list(df_columns.keys()))
+
 
 class DataFrameMarket(Market):
-    def __init__(self, df_historical_data, symbols=None, name=None):
+    def __init__(self, df_historical_data, symbols=None, name=None, read_only=False):
         super().__init__(symbols, name or self.__class__.__name__)
-        self.__df_historical_data__ = df_historical_data
+        self.__read_only__ = read_only
+        self.__df_historical_data__ = utils.read_only_df(df_historical_data) if read_only else df_historical_data
+        self.__calendar__ = None
+        self.__symbol_columns__ = None
+
+    def get_calendar(self):
+        if self.__calendar__ is None:
+            self.__calendar__ = df_to_calendar(self.__df_historical_data__)
+        return self.__calendar__
+
+    def get_symbol_columns(self, symbol):
+        if self.__symbol_columns__ is None:
+            self.__symbol_columns__ = collections.defaultdict(list)
+            for col in self.__df_historical_data__.columns:
+                self.__symbol_columns__[col.rsplit('_', 1)[0]].append(col)
+        return self.__symbol_columns__.get(symbol, [])
 
     def get_dates(self, symbols=None, start=None, end=None):
-        df = self.__df_historical_data__.copy()
-        if start is not None:
-            df = df.loc[start:]
-        if end is not None:
-            df = df.loc[:end]
-        if symbols is None:
-            return df.dropna(thresh=1).index.values
-        else:
-            return df.filter(regex='^({})_Date'.format('|'.join(symbols))).dropna(thresh=1).index.values
+        return self.get_calendar().get_dates(symbols=symbols, start=start, end=end)
 
     def get_symbols(self, date=None):
-        suffix = '_Date'
-        if date is None:
-            symbols = [_[:-len(suffix)] for _ in self.__df_historical_data__.filter(like=suffix).columns]
-        else:
-            symbols = [_[:-len(suffix)] for _ in self.__df_historical_data__.filter(like=suffix).loc[date:date].dropna(axis=1).columns]
+        symbols = self.get_calendar().get_symbols(date)
         if self.__symbols__ is None or len(self.__symbols__) == 0:
             return symbols
         else:
             return [_ for _ in symbols if _ in self.__symbols__]
 
     def get_quotes(self, date=None, symbol=None, start=None, end=None):
-        df = self.__df_historical_data__.copy()
+        df = self.__df_historical_data__ if self.__read_only__ else self.__df_historical_data__.copy()
         if start is not None:
             df = df.loc[start:]
         if end is not None:
@@ -84,12 +275,20 @@ class DataFrameMarket(Market):
         if date is not None:
             df = df.loc[date:date]
         if symbol is not None:
-            df = df.filter(regex='^{}_'.format(symbol))
-            df.columns = [_.replace('{}_'.format(symbol), '') for _ in df.columns]
+            df = df.loc[:, self.get_symbol_columns(symbol)]
+            df.columns = [_[len(symbol) + 1:] for _ in df.columns]
             df = df.dropna()
         return df
 
     def __get_value_by_column__(self, column, date=None, symbol=None, start=None, end=None):
+        if date is not None and symbol is not None and start is None and end is None:
+            calendar = self.get_calendar()
+            row = calendar.get_row(date)
+            symbol_column = calendar.get_column(symbol)
+            if row is not None and symbol_column is not None and calendar.available[row, symbol_column]:
+                value = self.__df_historical_data__.at[calendar.dates[row], '{}_{}'.format(symbol, column)]
+                if pd.notnull(value):
+                    return value
         df = self.get_quotes(date=date, symbol=symbol, start=start, end=end).filter(like=column)
         if len(df.columns) == 1 and len(df.index.values) == 1:
             return df.iloc[0][column]
@@ -110,15 +309,602 @@ class DataFrameMarket(Market):
     def get_volume(self, date=None, symbol=None, start=None, end=None):
         return self.__get_value_by_column__('Volume', date=date, symbol=symbol, start=start, end=end)
 
+    def trim(self, start=None, end=None):
+        df = self.__df_historical_data__.loc[start:end]
+        return DataFrameMarket(df, symbols=self.__symbols__, name=self.name, read_only=self.__read_only__)
+
+    def memory_usage(self):
+        return self.__df_historical_data__.memory_usage(index=True, deep=True)
+
+    def __create_snapshot__(self, date):
+        calendar = self.get_calendar()
+        row = calendar.get_row(date)
+        if row is None:
+            return Snapshot(date, [], *[np.array([], dtype=float) for _ in SNAPSHOT_FIELDS])
+        symbols = calendar.get_symbols(date)
+        bar = self.__df_historical_data__.loc[calendar.dates[row]]
+        values = [pd.to_numeric(bar.reindex(['{}_{}'.format(symbol, field) for symbol in symbols])).values
+                  for field in SNAPSHOT_FIELDS]
+        return Snapshot(date, symbols, *values)
+
+    def __resample__(self, rule):
+        values, dates, columns, available = resample_panel(*df_to_panel(self.__df_historical_data__), rule=rule)
+        return DataFrameMarket(panel_to_df(values, dates, columns, available), symbols=self.__symbols__,
+                               name=self.name, read_only=self.__read_only__)
+
+    def append_bars(self, df_new_bars):
+        if len(df_new_bars.index) == 0:
+            return None
+        df_new_bars = _with_date_columns(df_new_bars.sort_index())
+        df = self.__df_historical_data__
+        if len(df.index) > 0 and df_new_bars.index[0] <= df.index[-1]:
+            raise ValueError('Bars to append must be dated after {}.'.format(df.index[-1]))
+        columns = list(df.columns) + [_ for _ in df_new_bars.columns if _ not in df.columns]
+        df = pd.concat([df, df_new_bars]).reindex(columns=columns)
+        self.__df_historical_data__ = utils.read_only_df(df) if self.__read_only__ else df
+        self.__calendar__ = None
+        self.__symbol_columns__ = None
+        self.__snapshots__.clear()
+        self.__resampled__.clear()
+        return pd.Timestamp(df_new_bars.index[0]), pd.Timestamp(df_new_bars.index[-1])
+
+
+class PanelMarket(Market):
+    """
+    Market backed by one dense (date, symbol) array per field, e.g. values['Close'][row, column].
+    Rows follow the calendar dates and columns follow the calendar symbols, so every getter
+    is an array slice instead of a regex filter over a wide DataFrame.
+    """
+
+    def __init__(self, values, dates, columns, available=None, symbols=None, name=None, read_only=False):
+        super().__init__(symbols, name or self.__class__.__name__)
+        self.__values__ = values
+        self.__fields__ = list(values.keys())
+        if available is None:
+            available = np.logical_and.reduce([~np.isnan(values[field]) for field in self.__fields__])
+        self.__calendar__ = TradingCalendar(dates, columns, available)
+        self.__read_only__ = read_only
+        if read_only:
+            self.__freeze__()
+
+    def __freeze__(self):
+        for field in self.__fields__:
+            self.__values__[field].setflags(write=False)
+        self.__calendar__.available.setflags(write=False)
+
+    def get_calendar(self):
+        return self.__calendar__
+
+    def get_fields(self):
+        return self.__fields__
+
+    def memory_usage(self):
+        usage = collections.OrderedDict((field, self.__values__[field].nbytes) for field in self.__fields__)
+        usage['Available'] = self.__calendar__.available.nbytes
+        usage['Index'] = self.__calendar__.dates.nbytes
+        return pd.Series(usage)
+
+    def __create_snapshot__(self, date):
+        calendar = self.__calendar__
+        row = calendar.get_row(date)
+        if row is None:
+            return Snapshot(date, [], *[np.array([], dtype=float) for _ in SNAPSHOT_FIELDS])
+        columns = np.flatnonzero(calendar.available[row])
+        values = [self.__values__[field][row, columns].astype(np.float64) if field in self.__values__
+                  else np.full(len(columns), np.nan) for field in SNAPSHOT_FIELDS]
+        return Snapshot(date, [calendar.columns[_] for _ in columns], *values)
+
+    def __resample__(self, rule):
+        calendar = self.__calendar__
+        values, dates, columns, available = resample_panel(self.__values__, calendar.dates, calendar.columns,
+                                                           calendar.available, rule=rule)
+        return PanelMarket(values, dates, columns, available=available, symbols=self.__symbols__, name=self.name,
+                           read_only=self.__read_only__)
+
+    def __get_field_values__(self, field, rows):
+        values = self.__values__[field][rows]
+        if np.issubdtype(values.dtype, np.floating):
+            return values
+        return np.where(self.__calendar__.available[rows], values, np.nan)
+
+    def get_dates(self, symbols=None, start=None, end=None):
+        return self.__calendar__.get_dates(symbols=symbols, start=start, end=end)
+
+    def get_symbols(self, date=None):
+        symbols = self.__calendar__.get_symbols(date)
+        if self.__symbols__ is None or len(self.__symbols__) == 0:
+            return symbols
+        else:
+            return [_ for _ in symbols if _ in self.__symbols__]
+
+    def get_quotes(self, date=None, symbol=None, start=None, end=None):
+        calendar = self.__calendar__
+        rows = calendar.get_rows(date=date, start=start, end=end)
+        if symbol is None:
+            values = np.stack([self.__get_field_values__(field, rows) for field in self.__fields__], axis=2)
+            columns = ['{}_{}'.format(s, field) for s in calendar.columns for field in self.__fields__]
+            return pd.DataFrame(values.reshape(values.shape[0], -1), index=calendar.dates[rows], columns=columns)
+        column = calendar.get_column(symbol)
+        if column is None:
+            return pd.DataFrame(columns=self.__fields__)
+        positions = np.flatnonzero(calendar.available[rows, column]) + rows.start
+        if self.__read_only__ and len(positions) > 0 and positions[-1] - positions[0] + 1 == len(positions):
+            positions = slice(positions[0], positions[-1] + 1)
+        values = collections.OrderedDict((field, self.__values__[field][positions, column])
+                                         for field in self.__fields__)
+        return pd.DataFrame(values, index=calendar.dates[positions], columns=self.__fields__, copy=False)
+
+    def __get_value_by_column__(self, column, date=None, symbol=None, start=None, end=None):
+        calendar = self.__calendar__
+        if date is not None and symbol is not None:
+            row = calendar.get_row(date)
+            symbol_column = calendar.get_column(symbol)
+            if row is not None and symbol_column is not None and calendar.available[row, symbol_column]:
+                return float(self.__values__[column][row, symbol_column])
+        rows = calendar.get_rows(date=date, start=start, end=end)
+        if symbol is None:
+            return pd.DataFrame(self.__get_field_values__(column, rows), index=calendar.dates[rows],
+                                columns=['{}_{}'.format(s, column) for s in calendar.columns], copy=False)
+        return self.get_quotes(date=date, symbol=symbol, start=start, end=end).filter(items=[column])
+
+    def get_open(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_value_by_column__('Open', date=date, symbol=symbol, start=start, end=end)
+
+    def get_high(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_value_by_column__('High', date=date, symbol=symbol, start=start, end=end)
 
-def csv_to_market(name, csv_path, symbols=None):
+    def get_low(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_value_by_column__('Low', date=date, symbol=symbol, start=start, end=end)
+
+    def get_close(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_value_by_column__('Close', date=date, symbol=symbol, start=start, end=end)
+
+    def get_volume(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_value_by_column__('Volume', date=date, symbol=symbol, start=start, end=end)
+
+    def trim(self, start=None, end=None):
+        calendar = self.__calendar__
+        rows = calendar.get_rows(start=start, end=end)
+        values = collections.OrderedDict((field, self.__values__[field][rows]) for field in self.__fields__)
+        return PanelMarket(values, calendar.dates[rows], calendar.columns, available=calendar.available[rows],
+                           symbols=self.__symbols__, name=self.name, read_only=self.__read_only__)
+
+    def append_bars(self, df_new_bars):
+        """
+        Appends bars dated after the last calendar date, adding new symbols as columns, and returns the (start, end)
+        dates of the appended bars.
+        """
+        new_values, new_dates, new_columns, new_available = df_to_panel(df_new_bars)
+        if len(new_dates) == 0:
+            return None
+        calendar = self.__calendar__
+        if len(calendar.dates) > 0 and new_dates[0] <= calendar.dates[-1]:
+            raise ValueError('Bars to append must be dated after {}.'.format(calendar.dates[-1]))
+        columns = calendar.columns + [_ for _ in new_columns if calendar.get_column(_) is None]
+        added_shape = (len(calendar.dates), len(columns) - len(calendar.columns))
+        dtypes = collections.OrderedDict((field, self.__values__[field].dtype) for field in self.__fields__)
+        new_values, new_available = _align_bars(new_values, new_columns, new_available, dtypes, columns)
+        for field, dtype in dtypes.items():
+            values = np.concatenate([self.__values__[field], _empty_values(added_shape, dtype)], axis=1)
+            self.__values__[field] = np.concatenate([values, new_values[field]])
+        available = np.concatenate([calendar.available, np.zeros(added_shape, dtype=np.bool_)], axis=1)
+        self.__calendar__ = TradingCalendar(calendar.dates.append(new_dates), columns,
+                                            np.concatenate([available, new_available]))
+        if self.__read_only__:
+            self.__freeze__()
+        self.__snapshots__.clear()
+        self.__resampled__.clear()
+        return new_dates[0], new_dates[-1]
+
+
+def df_to_panel(df_historical_data):
+    if not df_historical_data.index.is_monotonic_increasing:
+        df_historical_data = df_historical_data.sort_index()
+    columns = []
+    fields = []
+    for col in df_historical_data.columns:
+        symbol, field = col.rsplit('_', 1)
+        if symbol not in columns:
+            columns.append(symbol)
+        if field != 'Date' and field not in fields:
+            fields.append(field)
+    values = collections.OrderedDict()
+    for field in fields:
+        df_field = df_historical_data.reindex(columns=['{}_{}'.format(s, field) for s in columns])
+        values[field] = df_field.values.astype(np.float64)
+    available = np.logical_and.reduce([~np.isnan(values[field]) for field in fields])
+    df_dates = df_historical_data.reindex(columns=['{}_Date'.format(s) for s in columns], fill_value=True)
+    available = np.logical_and(available, pd.notnull(df_dates).values)
+    return values, pd.to_datetime(df_historical_data.index), columns, available
+
+
+def compact_panel(values, available):
+    """
+    Casts panel fields to COMPACT_DTYPES, e.g. float32 prices and int64 volumes. Integer fields cannot hold NaN
+    so missing bars become 0 there, which is why the availability mask rather than NaN marks a missing bar.
+    Single values and snapshots are still handed out as float64 so cash and share arithmetic keeps its precision.
+    """
+    compact_values = collections.OrderedDict()
+    for field, field_values in values.items():
+        dtype = np.dtype(COMPACT_DTYPES.get(field, np.float32))
+        if not np.issubdtype(dtype, np.floating):
+            field_values = np.where(available, np.rint(np.nan_to_num(field_values)), 0)
+        compact_values[field] = field_values.astype(dtype)
+    return compact_values
+
+
+def resample_panel(values, dates, columns, available, rule):
+    """
+    Aggregates panel bars into pandas resample bins of rule: first Open, highest High, lowest Low, last Close,
+    summed Volume and last value of any other field, over each symbol's available bars in the bin. Bins are
+    contiguous row ranges of the sorted dates, so every field is reduced with one ufunc.reduceat call.
+    """
+    dates = pd.DatetimeIndex(dates)
+    rows = pd.Series(np.arange(len(dates)), index=dates).resample(rule)
+    counts = rows.count()
+    bins = counts[counts > 0]
+    starts = rows.min()[bins.index].values.astype(np.int64)
+    resampled_values = collections.OrderedDict()
+    if len(starts) == 0:
+        shape = (0, len(columns))
+        for field, field_values in values.items():
+            resampled_values[field] = _empty_values(shape, field_values.dtype)
+        return resampled_values, pd.DatetimeIndex(bins.index), columns, np.zeros(shape, dtype=np.bool_)
+
+    row_numbers = np.arange(len(dates))[:, None]
+    resampled_available = np.logical_or.reduceat(available, starts, axis=0)
+    first_rows = np.minimum.reduceat(np.where(available, row_numbers, len(dates) - 1), starts, axis=0)
+    last_rows = np.maximum.reduceat(np.where(available, row_numbers, 0), starts, axis=0)
+    symbol_columns = np.arange(len(columns))[None, :]
+    for field, field_values in values.items():
+        if field == 'Open':
+            field_values = field_values[first_rows, symbol_columns]
+        elif field == 'High':
+            field_values = np.maximum.reduceat(np.where(available, field_values, -np.inf), starts, axis=0)
+        elif field == 'Low':
+            field_values = np.minimum.reduceat(np.where(available, field_values, np.inf), starts, axis=0)
+        elif field == 'Volume':
+            field_values = np.add.reduceat(np.where(available, field_values, 0), starts, axis=0)
+        else:
+            field_values = field_values[last_rows, symbol_columns]
+        empty = _empty_values(resampled_available.shape, values[field].dtype)
+        resampled_values[field] = np.where(resampled_available, field_values, empty).astype(values[field].dtype)
+    return resampled_values, pd.DatetimeIndex(bins.index), columns, resampled_available
+
+
+def panel_to_df(values, dates, columns, available):
+    """
+    Inverse of df_to_panel: a wide SYMBOL_Field DataFrame with a SYMBOL_Date column holding the bar date.
+    """
+    dates = pd.DatetimeIndex(dates)
+    df_columns = collections.OrderedDict()
+    for column, symbol in enumerate(columns):
+        symbol_available = available[:, column]
+        df_columns['{}_Date'.format(symbol)] = pd.Series(dates, index=dates).where(symbol_available)
+        for field, field_values in values.items():
+            df_columns['{}_{}'.format(symbol, field)] = np.where(symbol_available, field_values[:, column], np.nan)
+    return pd.DataFrame(df_columns, index=dates, columns=list(df_columns.keys()))
+
+
+def df_to_panel_market(name, df_historical_data, symbols=None, compact=False, read_only=False):
+    values, dates, columns, available = df_to_panel(df_historical_data)
+    if compact:
+        values = compact_panel(values, available)
+    return PanelMarket(values, dates, columns, available=available, symbols=symbols, name=name, read_only=read_only)
+
+
+def _empty_values(shape, dtype):
+    if np.issubdtype(dtype, np.floating):
+        return np.full(shape, np.nan, dtype=dtype)
+    return np.zeros(shape, dtype=dtype)
+
+
+def _align_bars(values, columns, available, dtypes, target_columns):
+    target_positions = {symbol: position for position, symbol in enumerate(target_columns)}
+    positions = [target_positions[_] for _ in columns]
+    shape = (available.shape[0], len(target_columns))
+    aligned_values = collections.OrderedDict()
+    for field, dtype in dtypes.items():
+        aligned_values[field] = _empty_values(shape, dtype)
+        if field in values:
+            field_values = values[field]
+            if not np.issubdtype(dtype, np.floating):
+                field_values = np.where(np.isnan(field_values), 0, field_values)
+            aligned_values[field][:, positions] = field_values.astype(dtype)
+    aligned_available = np.zeros(shape, dtype=np.bool_)
+    aligned_available[:, positions] = available
+    return aligned_values, aligned_available
+
+
+def csv_to_market(name, csv_path, symbols=None, read_only=False):
     df_historical_data = pd.read_csv(csv_path, parse_dates=True, index_col=0)
-    return DataFrameMarket(df_historical_data=df_historical_data, name=name, symbols=symbols)
+    return DataFrameMarket(df_historical_data=df_historical_data, name=name, symbols=symbols, read_only=read_only)
 
 
-def pkl_to_market(name, pkl_path, symbols=None):
+def pkl_to_market(name, pkl_path, symbols=None, read_only=False):
     df_historical_data = pd.read_pickle(pkl_path)
-    return DataFrameMarket(df_historical_data=df_historical_data, name=name, symbols=symbols)
+    return DataFrameMarket(df_historical_data=df_historical_data, name=name, symbols=symbols, read_only=read_only)
+
+
+def csv_to_panel_market(name, csv_path, symbols=None, compact=False, read_only=False):
+    return df_to_panel_market(name, pd.read_csv(csv_path, parse_dates=True, index_col=0), symbols=symbols,
+                              compact=compact, read_only=read_only)
+
+
+def pkl_to_panel_market(name, pkl_path, symbols=None, compact=False, read_only=False):
+    return df_to_panel_market(name, pd.read_pickle(pkl_path), symbols=symbols, compact=compact,
+                              read_only=read_only)
+
+
+class LazyMarket(Market):
+    """
+    Market backed by a directory of one pickle per symbol plus the saved TradingCalendar (see df_to_symbol_files).
+    Symbols are read on first access and kept in a least recently used cache of cache_size symbols, so a
+    strategy over a few symbols never loads the whole exchange. Wide getters (symbol=None) and snapshots read
+    every symbol of the universe, reusing cached symbols but leaving the cache as is, so they cannot evict it.
+    """
+
+    def __init__(self, dir_path, symbols=None, name=None, cache_size=LAZY_MARKET_CACHE_SIZE, read_only=False,
+                 start=None, end=None, calendar=None):
+        super().__init__(symbols, name or self.__class__.__name__)
+        self.dir_path = Path(dir_path)
+        self.cache_size = cache_size
+        self.__read_only__ = read_only
+        self.__start__ = start
+        self.__end__ = end
+        self.__calendar__ = calendar
+        self.__symbol_markets__ = collections.OrderedDict()
+
+    def get_calendar(self):
+        if self.__calendar__ is None:
+            df_available = pd.read_pickle(self.dir_path / config.MARKET_CALENDAR_FILENAME)
+            calendar = TradingCalendar(df_available.index, df_available.columns, df_available.values)
+            self.__calendar__ = calendar.trim(self.__start__, self.__end__)
+        return self.__calendar__
+
+    def get_cached_symbols(self):
+        return list(self.__symbol_markets__.keys())
+
+    def __get_symbol_market__(self, symbol):
+        if symbol in self.__symbol_markets__:
+            self.__symbol_markets__.move_to_end(symbol)
+            return self.__symbol_markets__[symbol]
+        symbol_market = self.__read_symbol_market__(symbol)
+        self.__symbol_markets__[symbol] = symbol_market
+        if len(self.__symbol_markets__) > self.cache_size:
+            self.__symbol_markets__.popitem(last=False)
+        return symbol_market
+
+    def __read_symbol_market__(self, symbol):
+        symbol_path = self.dir_path / '{}.{}'.format(symbol, config.PICKLE_EXTENSION)
+        if self.get_calendar().get_column(symbol) is None or not symbol_path.exists():
+            df = pd.DataFrame()
+        else:
+            df = pd.read_pickle(symbol_path).loc[self.__start__:self.__end__]
+        return DataFrameMarket(df, name=symbol, read_only=self.__read_only__)
+
+    def __peek_symbol_market__(self, symbol):
+        symbol_market = self.__symbol_markets__.get(symbol)
+        return self.__read_symbol_market__(symbol) if symbol_market is None else symbol_market
+
+    def __get_wide_market__(self):
+        dfs = [self.__peek_symbol_market__(symbol).get_quotes() for symbol in self.get_symbols()]
+        dfs = [_ for _ in dfs if not _.empty]
+        df = pd.concat(dfs, axis=1).sort_index() if len(dfs) > 0 else pd.DataFrame()
+        return DataFrameMarket(df, name=self.name)
+
+    def __get_market__(self, symbol):
+        return self.__get_wide_market__() if symbol is None else self.__get_symbol_market__(symbol)
+
+    def get_dates(self, symbols=None, start=None, end=None):
+        return self.get_calendar().get_dates(symbols=symbols, start=start, end=end)
+
+    def get_symbols(self, date=None):
+        symbols = self.get_calendar().get_symbols(date)
+        if self.__symbols__ is None or len(self.__symbols__) == 0:
+            return symbols
+        else:
+            return [_ for _ in symbols if _ in self.__symbols__]
+
+    def get_quotes(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_market__(symbol).get_quotes(date=date, symbol=symbol, start=start, end=end)
+
+    def get_open(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_market__(symbol).get_open(date=date, symbol=symbol, start=start, end=end)
+
+    def get_high(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_market__(symbol).get_high(date=date, symbol=symbol, start=start, end=end)
+
+    def get_low(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_market__(symbol).get_low(date=date, symbol=symbol, start=start, end=end)
+
+    def get_close(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_market__(symbol).get_close(date=date, symbol=symbol, start=start, end=end)
+
+    def get_volume(self, date=None, symbol=None, start=None, end=None):
+        return self.__get_market__(symbol).get_volume(date=date, symbol=symbol, start=start, end=end)
+
+    def trim(self, start=None, end=None):
+        return LazyMarket(self.dir_path, symbols=self.__symbols__, name=self.name, cache_size=self.cache_size,
+                          read_only=self.__read_only__,
+                          start=self.__start__ if start is None else start,
+                          end=self.__end__ if end is None else end,
+                          calendar=self.get_calendar().trim(start, end))
+
+    def __create_snapshot__(self, date):
+        symbols = self.get_symbols(date)
+        snapshots = [self.__peek_symbol_market__(symbol).__create_snapshot__(date) for symbol in symbols]
+        values = [np.array([snapshot.get_value(field, symbol) for snapshot, symbol in zip(snapshots, symbols)],
+                           dtype=float) for field in SNAPSHOT_FIELDS]
+        return Snapshot(date, symbols, *values)
+
+    def __resample__(self, rule):
+        return self.__get_wide_market__().resample(rule)
+
+
+def df_to_symbol_files(df_historical_data, dir_path):
+    """
+    Splits a wide SYMBOL_Field DataFrame into one pickle per symbol plus the calendar, the layout read by
+    LazyMarket.
+    """
+    dir_path = Path(dir_path)
+    dir_path.makedirs_p()
+    calendar = df_to_calendar(df_historical_data)
+    df_available = pd.DataFrame(calendar.available, index=calendar.dates, columns=calendar.columns)
+    df_available.to_pickle(dir_path / config.MARKET_CALENDAR_FILENAME)
+    symbol_columns = collections.defaultdict(list)
+    for col in df_historical_data.columns:
+        symbol_columns[col.rsplit('_', 1)[0]].append(col)
+    for symbol in calendar.columns:
+        df_symbol = df_historical_data.loc[:, symbol_columns[symbol]]
+        df_symbol = df_symbol[df_symbol['{}_Date'.format(symbol)].notnull()].sort_index()
+        df_symbol.to_pickle(dir_path / '{}.{}'.format(symbol, config.PICKLE_EXTENSION))
+    return dir_path
+
+
+def _source_stamp(pkl_path):
+    stat = os.stat(pkl_path)
+    return {'path': os.path.abspath(pkl_path), 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def pkl_to_symbol_files(pkl_path, dir_path):
+    """
+    Splits the pickled historical data into dir_path and records the pickle's path, modification time and size
+    next to the calendar, so symbol_files_outdated can tell when the pickle changes.
+    """
+    dir_path = df_to_symbol_files(pd.read_pickle(pkl_path), dir_path)
+    with open(dir_path / config.MARKET_SOURCE_FILENAME, 'w') as f:
+        json.dump(_source_stamp(pkl_path), f, indent=2)
+    return dir_path
+
+
+def symbol_files_outdated(pkl_path, dir_path):
+    source_path = Path(dir_path) / config.MARKET_SOURCE_FILENAME
+    if not source_path.exists():
+        return True
+    with open(source_path) as f:
+        return json.load(f) != _source_stamp(pkl_path)
+
+
+def update_symbol_files(pkl_path, dir_path):
+    """
+    Splits the pickle again when dir_path was never split from it or the pickle changed since, and returns
+    whether it did.
+    """
+    if not symbol_files_outdated(pkl_path, dir_path):
+        return False
+    print('Splitting {} into {}'.format(pkl_path, dir_path))
+    pkl_to_symbol_files(pkl_path, dir_path)
+    return True
+
+
+def symbol_files_to_market(name, dir_path, symbols=None, cache_size=LAZY_MARKET_CACHE_SIZE, read_only=False):
+    return LazyMarket(dir_path, symbols=symbols, name=name, cache_size=cache_size, read_only=read_only)
+
+
+def _mmap_path(dir_path, name):
+    return Path(dir_path) / '{}.{}'.format(name, config.MARKET_DATA_EXTENSION)
+
+
+def _write_mmap(dir_path, name, values):
+    path = _mmap_path(dir_path, name)
+    np.ascontiguousarray(values).tofile(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def _read_mmap_metadata(dir_path):
+    with open(Path(dir_path) / config.MARKET_METADATA_FILENAME) as f:
+        return json.load(f)
+
+
+def _write_mmap_metadata(dir_path, metadata):
+    path = Path(dir_path) / config.MARKET_METADATA_FILENAME
+    with open(path + '.tmp', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _format_mmap_date(date):
+    return pd.Timestamp(date).strftime(config.DATETIME_FORMAT)
+
+
+def market_to_mmap(panel_market: PanelMarket, dir_path):
+    """
+    Writes the panel as raw fixed-dtype arrays, one file per field plus the dates and the availability mask,
+    next to a small JSON metadata file describing their dtypes and shapes. Arrays are (date, symbol) row-major
+    so appending bars appends bytes to each file.
+    """
+    utils.makedirs(dir_path)
+    arrays = collections.OrderedDict((field, panel_market.__values__[field]) for field in panel_market.__fields__)
+    for name, values in arrays.items():
+        _write_mmap(dir_path, name, values)
+    calendar = panel_market.get_calendar()
+    _write_mmap(dir_path, 'dates', calendar.dates.values.astype('datetime64[ns]').view(np.int64))
+    _write_mmap(dir_path, 'available', calendar.available)
+    dates = calendar.dates
+    metadata = {'name': panel_market.name,
+                'fields': [[name, np.dtype(values.dtype).str] for name, values in arrays.items()],
+                'columns': calendar.columns,
+                'rows': len(dates),
+                'start': None if len(dates) == 0 else _format_mmap_date(dates[0]),
+                'end': None if len(dates) == 0 else _format_mmap_date(dates[-1])}
+    _write_mmap_metadata(dir_path, metadata)
+
+
+def pkl_to_mmap(name, pkl_path, dir_path, compact=False):
+    market_to_mmap(pkl_to_panel_market(name, pkl_path, compact=compact), dir_path)
+
+
+def _read_mmap(dir_path, name, dtype, shape):
+    if np.prod(shape) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(_mmap_path(dir_path, name), dtype=dtype, mode='r', shape=shape)
+
+
+def mmap_to_market(name, dir_path, symbols=None):
+    """
+    Opens a market written by market_to_mmap. The arrays are mapped read-only, so loading is near-instant
+    and processes opening the same directory share one copy of the quotes through the page cache.
+    """
+    metadata = _read_mmap_metadata(dir_path)
+    shape = (metadata['rows'], len(metadata['columns']))
+    values = collections.OrderedDict()
+    for field, dtype in metadata['fields']:
+        values[field] = _read_mmap(dir_path, field, np.dtype(dtype), shape)
+    dates = _read_mmap(dir_path, 'dates', np.int64, shape[:1]).view('datetime64[ns]')
+    available = _read_mmap(dir_path, 'available', np.bool_, shape)
+    return PanelMarket(values, dates, metadata['columns'], available=available, symbols=symbols,
+                       name=name or metadata['name'], read_only=True)
+
+
+def append_bars_to_mmap(dir_path, df_new_bars):
+    """
+    Appends bars dated after the store's last date to the end of each array file and returns their date range.
+    Bars that introduce new symbols change every row, so those rewrite the whole store.
+    """
+    metadata = _read_mmap_metadata(dir_path)
+    values, dates, columns, available = df_to_panel(df_new_bars)
+    if len(dates) == 0:
+        return None
+    if any(_ not in metadata['columns'] for _ in columns):
+        panel_market = mmap_to_market(None, dir_path)
+        appended = panel_market.append_bars(df_new_bars)
+        market_to_mmap(panel_market, dir_path)
+        return appended
+    if metadata['end'] is not None and dates[0] <= pd.Timestamp(metadata['end']):
+        raise ValueError('Bars to append must be dated after {}.'.format(metadata['end']))
+    dtypes = collections.OrderedDict((field, np.dtype(dtype)) for field, dtype in metadata['fields'])
+    values, available = _align_bars(values, columns, available, dtypes, metadata['columns'])
+    arrays = list(values.items()) + [('dates', dates.values.astype('datetime64[ns]').view(np.int64)),
+                                     ('available', available)]
+    for name, array in arrays:
+        with open(_mmap_path(dir_path, name), 'ab') as f:
+            np.ascontiguousarray(array).tofile(f)
+    metadata['rows'] = metadata['rows'] + len(dates)
+    metadata['start'] = metadata['start'] or _format_mmap_date(dates[0])
+    metadata['end'] = _format_mmap_date(dates[-1])
+    _write_mmap_metadata(dir_path, metadata)
+    return dates[0], dates[-1]
 
 
 def list_json_files(json_dir_path):
@@ -127,42 +913,60 @@ def list_json_files(json_dir_path):
 
 
 def read_json_file(json_path, datetime_format='%Y-%m-%d %H:00:00'):
+    """
+    Reads one symbol's quotes, stamping each bar with its local time formatted by datetime_format. Bars that
+    collapse onto the same timestamp, e.g. two ticks within one hour, keep only the last one and the dropped
+    timestamps are printed.
+    """
     df_raw = pd.read_json(json_path)
-    df_raw.t = df_raw.t.apply(lambda t: datetime.datetime.fromtimestamp(t).strftime(datetime_format))
+    t = pd.to_datetime(df_raw.t, unit='s', utc=True).dt.tz_convert(tz.tzlocal())
     df = pd.DataFrame()
-    df['Date'] = df_raw.t
+    df['Date'] = pd.to_datetime(t.dt.strftime(datetime_format), format=datetime_format)
     df['Open'] = df_raw.o
     df['High'] = df_raw.h
     df['Low'] = df_raw.l
     df['Close'] = df_raw.c
     df['Volume'] = df_raw.v
 
-    df['Date'] = [pd.to_datetime(_) for _ in df.Date.values]
     df.index = df.Date.values
-    return df
-
-
-def read_json_files(symbols, json_dir_path):
-    df = pd.DataFrame()
-    for symbol in symbols:
-        try:
-            df_quotes = read_json_file(json_dir_path / '{}.json'.format(symbol))
-            df_quotes.columns = ['{}_{}'.format(symbol, col) for col in df_quotes.columns]
-            df = df.join(df_quotes, how='outer')
-        except:
-            print(traceback.print_exc())
-    return df
-
-
-def json_files_directory_to_market(name, json_dir_path, symbols=None):
+    duplicated = df.index.duplicated(keep='last')
+    if duplicated.any():
+        dropped = ', '.join(pd.DatetimeIndex(df.index[duplicated]).strftime(config.DATETIME_FORMAT))
+        print('Dropping earlier duplicate bars in {}: {}'.format(json_path, dropped))
+    return df[~duplicated]
+
+
+def _read_symbol_json_file(symbol_json_path):
+    symbol, json_path = symbol_json_path
+    try:
+        df_quotes = read_json_file(json_path)
+        df_quotes.columns = ['{}_{}'.format(symbol, col) for col in df_quotes.columns]
+        return df_quotes
+    except:
+        traceback.print_exc()
+        return None
+
+
+def read_json_files(symbols, json_dir_path, processes=None):
+    symbol_json_paths = [(symbol, Path(json_dir_path) / '{}.json'.format(symbol)) for symbol in symbols]
+    if processes == 1:
+        frames = [_read_symbol_json_file(_) for _ in symbol_json_paths]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            frames = pool.map(_read_symbol_json_file, symbol_json_paths)
+    frames = [_ for _ in frames if _ is not None]
+    if len(frames) == 0:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1).sort_index()
+
+
+def json_files_directory_to_market(name, json_dir_path, symbols=None, processes=None):
     symbols = symbols or list_json_files(json_dir_path)
-    symbols = [_ for _ in symbols if os.path.exists(json_dir_path / '{}.json'.format(_))]
-    df_historical_data = read_json_files(symbols, json_dir_path)
-    print(df_historical_data)
-    pass
+    symbols = [_ for _ in symbols if os.path.exists(Path(json_dir_path) / '{}.json'.format(_))]
+    df_historical_data = read_json_files(symbols, json_dir_path, processes=processes)
+    return DataFrameMarket(df_historical_data=df_historical_data, name=name)
 
 
 if __name__ == '__main__':
-    from path import Path
     dir_path = config.RESOURCES_PATH / 'json_stocks'
-    json_files_directory_to_market('test', Path(dir_path))
\ No newline at end of file
+    print(json_files_directory_to_market('test', dir_path).get_quotes())
\ No newline at end of file
@@ -139,7 +139,7 @@ def performance_data(starting_capital, df_backtest, df_trades, index='Performanc
         df.loc[index, 'Profit Factor'] = 0.0
     df.loc[index, 'Payoff Ratio'] = df_winning_trades['LastPnL'].mean() / abs(df_losing_trades['LastPnL'].mean())
 
-    return utils.round_df(df, places=2)
+    return utils.round_df(df, places=2, stage=utils.RoundingStage.PERFORMANCE)
 
 
 def generate_equity_curve(df_trades, starting_balance, historical_data, selling_fees_method=None, start_date=None, end_date=None):
@@ -195,17 +195,18 @@ def generate_equity_curve(df_trades, starting_balance, historical_data, selling_
         df['Drawdown'] = df['Equity'].expanding().apply(drawdown)
         df['DrawdownPercent'] = df['Equity'].expanding().apply(drawdown_pct)
 
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.EQUITY_CURVE)
     return df
 
 def generate_report(df_trades, starting_balance, historical_data, output_dir_path, calculate_selling_fees_method=None):
     df_equity_curve = generate_equity_curve(df_trades=df_trades, starting_balance=starting_balance, historical_data=historical_data, selling_fees_method=calculate_selling_fees_method)
     if not df_equity_curve.empty:
-        df_equity_curve.to_csv(output_dir_path / 'equity_curve.csv')
+        utils.round_df(df_equity_curve, stage=utils.RoundingStage.EQUITY_CURVE,
+                       output=True).to_csv(output_dir_path / 'equity_curve.csv')
         chart.generate_equity_chart(df_equity_curve=df_equity_curve, fpath=output_dir_path / 'equity_curve_chart.pdf')
 
         df = pd.DataFrame()
         df['Performance'] = performance_data(starting_balance, df_equity_curve, df_trades).iloc[0]
-        df.to_csv(output_dir_path / 'report.csv')
+        utils.round_df(df, stage=utils.RoundingStage.PERFORMANCE, output=True).to_csv(output_dir_path / 'report.csv')
 
 
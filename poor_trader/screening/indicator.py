@@ -1,7 +1,15 @@
 import abc
+import atexit
 import collections
-import os
+import copy
+import hashlib
 import inspect
+import json
+import math
+import multiprocessing
+import os
+import time
+import traceback
 from enum import Enum
 
 import numpy as np
@@ -12,6 +20,7 @@ from poor_trader.market import Market, pkl_to_market
 from poor_trader.screening import entity
 from poor_trader import config, utils
 from poor_trader.screening.entity import Direction
+from poor_trader.screening.store import get_store, drain_stores, merge_stores, flush_stores
 
 
 class IndicatorRunnerFactory(object):
@@ -47,11 +56,50 @@ class IndicatorRunner(object):
     def run(self, symbol, df_quotes, df_indicator=None):
         raise NotImplementedError
 
+    def run_panel(self, quotes_panel):
+        """
+        Optional batched kernel returning the same columns as run() for every symbol of a QuotesPanel at once,
+        as an OrderedDict of column -> (bar, symbol) DataFrame. Runners without one are run symbol by symbol.
+        """
+        raise NotImplementedError
+
+    def has_panel_kernel(self):
+        return type(self).run_panel is not IndicatorRunner.run_panel
+
+    def get_lookback(self):
+        """
+        Number of bars before the first new one that run() needs to reproduce its values, so a saved result can
+        be extended by running over just the tail. None means every value depends on the whole history.
+        """
+        return None
+
+    def get_dependencies(self):
+        """
+        Runners that run() creates through self.factory over the same quotes, so their work can be planned ahead.
+        """
+        return []
+
+    def detached(self):
+        runner = copy.copy(self)
+        runner.factory = IndicatorRunnerFactory()
+        return runner
+
     @staticmethod
     def add_direction(df, long_condition, short_condition):
         df[Direction.__name__] = np.where(long_condition, entity.Direction.LONG,
                                    np.where(short_condition, entity.Direction.SHORT, ''))
 
+    @staticmethod
+    def panel_direction(quotes_panel, long_condition, short_condition):
+        return quotes_panel.to_frame(np.where(long_condition, entity.Direction.LONG,
+                                              np.where(short_condition, entity.Direction.SHORT, '')))
+
+    @staticmethod
+    def round_panel(values):
+        return collections.OrderedDict(
+            (col, df if col == Direction.__name__ else utils.round_df(df, stage=utils.RoundingStage.INDICATOR))
+            for col, df in values.items())
+
     @staticmethod
     def is_updated(df_quotes, df_indicator):
         if df_indicator is None:
@@ -80,21 +128,164 @@ class IndicatorRunner(object):
         return return_values
 
 
+class QuotesPanel(object):
+    """
+    Quotes of many symbols packed bar by bar: row i of a field holds every symbol's i-th bar, and shorter
+    histories are padded with NaN at the end. Rolling windows over the rows therefore see exactly the bars
+    a per-symbol run would, so one DataFrame.rolling call covers the whole market.
+    """
+
+    def __init__(self, symbols, dates, values, index_name=None):
+        self.symbols = list(symbols)
+        self.dates = dates
+        self.values = values
+        self.index_name = index_name
+        self.__fingerprint__ = None
+        self.lengths = np.array([np.count_nonzero(~np.isnat(dates[:, column])) for column in range(len(self.symbols))],
+                                dtype=np.int64)
+
+    def get_field(self, field):
+        return self.to_frame(self.values[field])
+
+    def tail(self, start):
+        return QuotesPanel(self.symbols, self.dates[start:],
+                           collections.OrderedDict((field, values[start:]) for field, values in self.values.items()),
+                           index_name=self.index_name)
+
+    def fingerprint(self):
+        if self.__fingerprint__ is None:
+            md5 = hashlib.md5(str(self.symbols).encode())
+            md5.update(self.dates.view('i8').tobytes())
+            for field, values in self.values.items():
+                md5.update(field.encode())
+                md5.update(np.ascontiguousarray(values).tobytes())
+            self.__fingerprint__ = md5.hexdigest()
+        return self.__fingerprint__
+
+    def digest(self, mask):
+        """
+        md5 of the bars under mask, a boolean array over the first rows of the panel, e.g. to check that the bars
+        a saved result was computed from are unchanged.
+        """
+        rows = len(mask)
+        md5 = hashlib.md5(str(self.symbols).encode())
+        md5.update(self.dates[:rows][mask].view('i8').tobytes())
+        for field, values in self.values.items():
+            md5.update(field.encode())
+            md5.update(values[:rows][mask].tobytes())
+        return md5.hexdigest()
+
+    def to_frame(self, values):
+        return pd.DataFrame(values, columns=self.symbols)
+
+    def unpack(self, values):
+        """
+        Yields (symbol, DataFrame) pairs of a run_panel result, indexed by each symbol's own dates like run().
+        """
+        for column, symbol in enumerate(self.symbols):
+            length = self.lengths[column]
+            index = pd.DatetimeIndex(self.dates[:length, column], name=self.index_name)
+            columns = collections.OrderedDict((col, np.asarray(df)[:length, column]) for col, df in values.items())
+            yield symbol, pd.DataFrame(columns, index=index, columns=list(columns.keys()))
+
+
+def quotes_to_panel(quotes):
+    """
+    Packs (symbol, df_quotes) pairs into a QuotesPanel of their numeric fields.
+    """
+    quotes = [(symbol, df_quotes) for symbol, df_quotes in quotes if not df_quotes.empty]
+    fields = []
+    for symbol, df_quotes in quotes:
+        fields += [col for col in df_quotes.columns if col not in fields and col != 'Date']
+    shape = (max([len(df_quotes.index) for symbol, df_quotes in quotes] or [0]), len(quotes))
+    dates = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+    values = collections.OrderedDict((field, np.full(shape, np.nan)) for field in fields)
+    for column, (symbol, df_quotes) in enumerate(quotes):
+        length = len(df_quotes.index)
+        dates[:length, column] = pd.DatetimeIndex(df_quotes.index).values
+        for field in fields:
+            if field in df_quotes.columns:
+                values[field][:length, column] = df_quotes[field].values
+    index_name = quotes[0][1].index.name if len(quotes) > 0 else None
+    return QuotesPanel([symbol for symbol, df_quotes in quotes], dates, values, index_name=index_name)
+
+
+def market_to_quotes_panel(market: Market):
+    return quotes_to_panel((symbol, market.get_quotes(symbol=symbol)) for symbol in market.get_symbols())
+
+
+def _recursive_filter(values, seeds, step):
+    """
+    Single pass of out[i] = step(out[i - 1], values[i]). Wherever out[i - 1] is NaN the filter restarts from
+    seeds[i], so NaN seeds before the first valid one leave the output NaN. The recursion itself stays sequential,
+    since a closed form would not reproduce step's rounding, so a series loops over plain floats and a
+    (bar, symbol) panel loops over its rows with each step applied to every symbol at once.
+    """
+    if np.ndim(seeds) > 1:
+        values = np.asarray(values, dtype=float)
+        out = np.array(seeds, dtype=float)
+        for i in range(1, len(out)):
+            prev = out[i - 1]
+            out[i] = np.where(np.isnan(prev), out[i], step(prev, values[i]))
+        return out
+    values = np.asarray(values, dtype=float).tolist()
+    out = np.asarray(seeds, dtype=float).tolist()
+    for i in range(1, len(out)):
+        prev = out[i - 1]
+        if not math.isnan(prev):
+            out[i] = step(prev, values[i])
+    return np.array(out, dtype=float)
+
+
+def _segmented_cumsum(values):
+    """
+    Cumulative sum that restarts after every NaN, e.g. [1, 2, nan, 3, 4] -> [1, 3, nan, 3, 7].
+    """
+    out = np.array(values, dtype=float)
+    valid = np.concatenate([[False], ~np.isnan(out), [False]]).astype(np.int8)
+    bounds = np.flatnonzero(np.diff(valid))
+    for start, end in zip(bounds[::2], bounds[1::2]):
+        out[start:end] = np.cumsum(out[start:end])
+    return out
+
+
+def sma_bank(series, periods):
+    """
+    Simple moving averages of series for every period, as a (bar, period) DataFrame. Each column is summed by
+    rolling(period).mean() like the SMA runner, so it matches that runner to the last bit and rounds the same,
+    without a runner, cache lookup and saved result per period.
+    """
+    series = pd.Series(np.asarray(series, dtype=float), index=getattr(series, 'index', None))
+    return pd.DataFrame(collections.OrderedDict((period, series.rolling(period).mean()) for period in periods),
+                        index=series.index, columns=list(periods))
+
+
 class STDEV(IndicatorRunner):
     def __init__(self, period=10, field='Close'):
         super().__init__(self.__class__.__name__, locals())
         self.period = period
         self.field = field
 
+    def get_lookback(self):
+        return self.period - 1
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
         df = pd.DataFrame(index=df_quotes.index)
         df['STDEV'] = df_quotes[self.field].rolling(self.period).std()
         self.add_direction(df, df_quotes[self.field] > df['STDEV'], df_quotes[self.field] < df['STDEV'])
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
+    def run_panel(self, quotes_panel):
+        df_field = quotes_panel.get_field(self.field)
+        values = collections.OrderedDict()
+        values['STDEV'] = df_field.rolling(self.period).std()
+        values[Direction.__name__] = self.panel_direction(quotes_panel, df_field > values['STDEV'],
+                                                          df_field < values['STDEV'])
+        return self.round_panel(values)
+
 
 class EMA(IndicatorRunner):
     def __init__(self, period=10, field='Close'):
@@ -102,25 +293,43 @@ class EMA(IndicatorRunner):
         self.period = period
         self.field = field
 
+    def get_dependencies(self):
+        return [self.factory.create(SMA, period=self.period, field=self.field)]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
         c = 2./(self.period + 1.)
-        df = pd.DataFrame(columns=['EMA'], index=df_quotes.index)
-        _sma = self.factory.create(SMA, period=self.period, field=self.field).run(symbol, df_quotes).dropna()
-        if not _sma.empty:
-            df.loc[_sma.index.values[0], 'EMA'] = _sma.SMA.values[0]
-            for i in range(1, len(df_quotes)):
-                prev_ema = df.iloc[i-1]
-                if pd.isnull(prev_ema.EMA): continue
-                price = df_quotes.iloc[i]
-                ema_value = c * price[self.field] + (1. - c) * prev_ema.EMA
-                df.loc[df_quotes.index.values[i], 'EMA'] = ema_value
+        df = pd.DataFrame(index=df_quotes.index)
+        seeds = np.full(len(df_quotes.index), np.nan)
+        _sma = self.factory.create(SMA, period=self.period, field=self.field).run(symbol, df_quotes)
+        seed_positions = np.flatnonzero(_sma.SMA.notnull().values)
+        if len(seed_positions) > 0:
+            seeds[seed_positions[0]] = _sma.SMA.values[seed_positions[0]]
+        df['EMA'] = _recursive_filter(df_quotes[self.field].values, seeds,
+                                      lambda prev_ema, price: c * price + (1. - c) * prev_ema)
 
         self.add_direction(df, df_quotes[self.field] > df['EMA'], df_quotes[self.field] < df['EMA'])
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
+    def run_panel(self, quotes_panel):
+        c = 2./(self.period + 1.)
+        df_field = quotes_panel.get_field(self.field)
+        sma = self.factory.create(SMA, period=self.period, field=self.field).run_panel(quotes_panel)[
+            SMA.Columns.SMA.value].values
+        seeds = np.full(sma.shape, np.nan)
+        valid = ~np.isnan(sma)
+        columns = np.flatnonzero(valid.any(axis=0))
+        rows = valid.argmax(axis=0)[columns]
+        seeds[rows, columns] = sma[rows, columns]
+        values = collections.OrderedDict()
+        values['EMA'] = quotes_panel.to_frame(
+            _recursive_filter(df_field.values, seeds, lambda prev_ema, price: c * price + (1. - c) * prev_ema))
+        values[Direction.__name__] = self.panel_direction(quotes_panel, df_field > values['EMA'],
+                                                          df_field < values['EMA'])
+        return self.round_panel(values)
+
 
 class SMA(IndicatorRunner):
     class Columns(Enum):
@@ -131,6 +340,9 @@ class SMA(IndicatorRunner):
         self.period = period
         self.field = field
 
+    def get_lookback(self):
+        return self.period - 1
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -138,9 +350,17 @@ class SMA(IndicatorRunner):
             df = pd.DataFrame(index=df_quotes.index)
             df[self.Columns.SMA.value] = df_quotes[self.field].rolling(self.period).mean()
             self.add_direction(df, df_quotes[self.field] > df[self.Columns.SMA.value], df_quotes[self.field] < df[self.Columns.SMA.value])
-            df = utils.round_df(df)
+            df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
             return df
 
+    def run_panel(self, quotes_panel):
+        df_field = quotes_panel.get_field(self.field)
+        values = collections.OrderedDict()
+        values[self.Columns.SMA.value] = df_field.rolling(self.period).mean()
+        values[Direction.__name__] = self.panel_direction(quotes_panel, df_field > values[self.Columns.SMA.value],
+                                                          df_field < values[self.Columns.SMA.value])
+        return self.round_panel(values)
+
 
 class ATR(IndicatorRunner):
     def __init__(self, period=10):
@@ -160,15 +380,31 @@ class ATR(IndicatorRunner):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
 
-        df = pd.DataFrame(columns=['ATR'], index=df_quotes.index)
+        df = pd.DataFrame(index=df_quotes.index)
         df_true_range = self.true_range(df_quotes)
-        df['ATR'] = df_true_range.true_range.rolling(self.period).mean()
-        for i in df.index.values:
-            if pd.isnull(df['ATR'].shift(1).loc[i]): continue
-            df.loc[i, 'ATR'] = (df['ATR'].shift(1).loc[i] * (self.period-1) + df_true_range.loc[i].true_range) / self.period
+        period = self.period
+        df['ATR'] = _recursive_filter(df_true_range.true_range.values,
+                                      df_true_range.true_range.rolling(period).mean().values,
+                                      lambda prev_atr, true_range: (prev_atr * (period - 1) + true_range) / period)
 
         self.add_direction(df, False, False)
-        return utils.round_df(df)
+        return utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
+
+    def run_panel(self, quotes_panel):
+        df_high = quotes_panel.get_field('High')
+        df_low = quotes_panel.get_field('Low')
+        df_prev_close = quotes_panel.get_field('Close').shift(1)
+        ranges = [df_high - df_low, abs(df_high - df_prev_close), abs(df_low - df_prev_close)]
+        ranges = [utils.round_df(df, 4).values for df in ranges]
+        df_true_range = quotes_panel.to_frame(np.fmax(ranges[0], np.fmax(ranges[1], ranges[2])))
+        period = self.period
+        values = collections.OrderedDict()
+        values['ATR'] = quotes_panel.to_frame(
+            _recursive_filter(df_true_range.values, df_true_range.rolling(period).mean().values,
+                              lambda prev_atr, true_range: (prev_atr * (period - 1) + true_range) / period))
+        values[Direction.__name__] = self.panel_direction(quotes_panel, np.zeros(df_true_range.shape, dtype=bool),
+                                                          np.zeros(df_true_range.shape, dtype=bool))
+        return self.round_panel(values)
 
 
 class ATRChannel(IndicatorRunner):
@@ -183,6 +419,10 @@ class ATRChannel(IndicatorRunner):
         self.bottom = bottom
         self.sma = sma
 
+    def get_dependencies(self):
+        return [self.factory.create(ATR, period=self.top), self.factory.create(ATR, period=self.bottom),
+                self.factory.create(SMA, period=self.sma)]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -195,7 +435,7 @@ class ATRChannel(IndicatorRunner):
         df[self.Columns.TOP.value] = df[self.Columns.MID.value] + df_top_atr.ATR
         df[self.Columns.BOTTOM.value] = df[self.Columns.MID.value] - df_bottom_atr.ATR
         self.add_direction(df, df_quotes.Close > df[self.Columns.TOP.value], df_quotes.Close < df[self.Columns.BOTTOM.value])
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
 
@@ -209,51 +449,45 @@ class TrailingStops(IndicatorRunner):
         self.multiplier = multiplier
         self.period = period
 
+    def get_dependencies(self):
+        return [self.factory.create(ATR, period=self.period)]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
 
-        df = pd.DataFrame(columns=['BuyStops', 'SellStops'], index=df_quotes.index)
         df_atr = self.factory.create(ATR, period=self.period).run(symbol, df_quotes)
+        close = df_quotes.Close.values.astype(float).tolist()
+        atr = df_atr.ATR.values.astype(float).tolist()
+        max_close = df_quotes.Close.rolling(self.period, min_periods=1).max().values.tolist()
+        min_close = df_quotes.Close.rolling(self.period, min_periods=1).min().values.tolist()
+        buy_stops = [np.nan] * len(close)
+        sell_stops = [np.nan] * len(close)
         sign = -1  # SellStops: -1, BuyStops: 1
-        for i in range(len(df_quotes)-1):
-            if pd.isnull(df_atr.iloc[i].ATR): continue
-            start = i - self.period
-            end = i
-            quotes = df_quotes.iloc[start+1:end+1]
-            cur_quote = df_quotes.iloc[i]
-            next_quote = df_quotes.iloc[i + 1]
-            _atr = df_atr.iloc[i].ATR
-
-            # close_price = next_quote.Close
-            # trend_dir_sign = -1 if close_price > _atr else 1
-
-            max_price = quotes.Close.max()
-            min_price = quotes.Close.min()
-
-            sell = max_price + sign * (self.multiplier * _atr)
-            buy = min_price + sign * (self.multiplier * _atr)
-
-            sell = [sell, df.iloc[i].SellStops]
-            buy = [buy, df.iloc[i].BuyStops]
-
-            try:
-                sell = np.max([x for x in sell if not pd.isnull(x)])
-                buy = np.min([x for x in buy if not pd.isnull(x)])
-            except:
-                print(sell)
-
+        for i in range(len(close) - 1):
+            if math.isnan(atr[i]): continue
+            offset = sign * (self.multiplier * atr[i])
             if sign < 0:
-                df.loc[df_quotes.index.values[i+1]]['SellStops'] = sell
-                if next_quote.Close <= sell:
+                # Stops only tighten while the trend holds
+                sell = max_close[i] + offset
+                if math.isnan(sell) or sell_stops[i] > sell:
+                    sell = sell_stops[i]
+                sell_stops[i + 1] = sell
+                if close[i + 1] <= sell:
                     sign = 1
             else:
-                df.loc[df_quotes.index.values[i+1]]['BuyStops'] = buy
-                if next_quote.Close >= buy:
+                buy = min_close[i] + offset
+                if math.isnan(buy) or buy_stops[i] < buy:
+                    buy = buy_stops[i]
+                buy_stops[i + 1] = buy
+                if close[i + 1] >= buy:
                     sign = -1
 
+        df = pd.DataFrame(collections.OrderedDict([(self.Columns.LONG.value, buy_stops),
+                                                   (self.Columns.SHORT.value, sell_stops)]),
+                          index=df_quotes.index)
         self.add_direction(df, df_quotes.Close >= df.BuyStops, df_quotes.Close <= df.SellStops)
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
 
@@ -268,6 +502,9 @@ class DonchianChannel(IndicatorRunner):
         self.high = high
         self.low = low
 
+    def get_lookback(self):
+        return max(self.high, self.low)
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -281,9 +518,22 @@ class DonchianChannel(IndicatorRunner):
                                               df[self.Columns.LOW.value].shift(1) <= df[self.Columns.LOW.value]),
                            np.logical_or(df[self.Columns.LOW.value].shift(1) > df[self.Columns.LOW.value],
                                           df[self.Columns.HIGH.value].shift(1) > df[self.Columns.HIGH.value]))
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
+    def run_panel(self, quotes_panel):
+        df_high = quotes_panel.get_field('High').rolling(window=self.high).max()
+        df_low = quotes_panel.get_field('Low').rolling(window=self.low).min()
+        values = collections.OrderedDict()
+        values[self.Columns.HIGH.value] = df_high
+        values[self.Columns.MID.value] = (df_high + df_low)/2
+        values[self.Columns.LOW.value] = df_low
+        values[Direction.__name__] = self.panel_direction(
+            quotes_panel,
+            np.logical_and(df_high.shift(1) < df_high, df_low.shift(1) <= df_low),
+            np.logical_or(df_low.shift(1) > df_low, df_high.shift(1) > df_high))
+        return self.round_panel(values)
+
 
 class MACD(IndicatorRunner):
     def __init__(self, fast=12, slow=26, signal=9):
@@ -292,6 +542,9 @@ class MACD(IndicatorRunner):
         self.slow = slow
         self.signal = signal
 
+    def get_dependencies(self):
+        return [self.factory.create(EMA, period=self.fast), self.factory.create(EMA, period=self.slow)]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -305,7 +558,7 @@ class MACD(IndicatorRunner):
         df['MACDCrossoverSignal'] = np.where(np.logical_and(df.MACD > df.Signal, df.MACD.shift(1) <= df.Signal.shift(1)), 1, 0)
         df['SignalCrossoverMACD'] = np.where(np.logical_and(df.MACD < df.Signal, df.Signal.shift(1) <= df.MACD.shift(1)), 1, 0)
         self.add_direction(df, df['MACDCrossoverSignal'] == 1, df['SignalCrossoverMACD'] == 1)
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
 
@@ -321,6 +574,12 @@ class MACross(IndicatorRunner):
         self.fast = fast
         self.slow = slow
 
+    def get_lookback(self):
+        return max(self.fast, self.slow)
+
+    def get_dependencies(self):
+        return [self.factory.create(SMA, period=self.fast), self.factory.create(SMA, period=self.slow)]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -333,9 +592,22 @@ class MACross(IndicatorRunner):
         df[self.Columns.SLOW_ON_TOP.value] = np.where(np.logical_and(df[self.Columns.FAST.value] <= df[self.Columns.SLOW.value], df[self.Columns.FAST.value].shift(1) > df[self.Columns.SLOW.value].shift(1)), 1, 0)
         df[self.Columns.FAST_ON_TOP.value] = np.where(np.logical_and(df[self.Columns.FAST.value] >= df[self.Columns.SLOW.value], df[self.Columns.SLOW.value].shift(1) > df[self.Columns.FAST.value].shift(1)), 1, 0)
         self.add_direction(df, df[self.Columns.FAST.value] > df[self.Columns.SLOW.value], df[self.Columns.SLOW.value] > df[self.Columns.FAST.value])
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
+    def run_panel(self, quotes_panel):
+        fast_sma = self.factory.create(SMA, period=self.fast).run_panel(quotes_panel)[SMA.Columns.SMA.value]
+        slow_sma = self.factory.create(SMA, period=self.slow).run_panel(quotes_panel)[SMA.Columns.SMA.value]
+        values = collections.OrderedDict()
+        values[self.Columns.FAST.value] = fast_sma
+        values[self.Columns.SLOW.value] = slow_sma
+        values[self.Columns.SLOW_ON_TOP.value] = quotes_panel.to_frame(np.where(np.logical_and(
+            fast_sma <= slow_sma, fast_sma.shift(1) > slow_sma.shift(1)), 1, 0))
+        values[self.Columns.FAST_ON_TOP.value] = quotes_panel.to_frame(np.where(np.logical_and(
+            fast_sma >= slow_sma, slow_sma.shift(1) > fast_sma.shift(1)), 1, 0))
+        values[Direction.__name__] = self.panel_direction(quotes_panel, fast_sma > slow_sma, slow_sma > fast_sma)
+        return self.round_panel(values)
+
 
 class Volume(IndicatorRunner):
     class Columns(Enum):
@@ -348,6 +620,9 @@ class Volume(IndicatorRunner):
         super().__init__(self.__class__.__name__, locals())
         self.period = period
 
+    def get_dependencies(self):
+        return [self.factory.create(EMA, period=self.period, field='Volume')]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -363,7 +638,7 @@ class Volume(IndicatorRunner):
                                               df[self.Columns.VOLUME.value].shift(1) < df[self.Columns.EMA.value].shift(1)),
                            np.logical_and(df[self.Columns.VOLUME.value] < df[self.Columns.EMA.value],
                                           df[self.Columns.VOLUME.value].shift(1) > df[self.Columns.EMA.value].shift(1)))
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
 
@@ -388,13 +663,17 @@ class TrendStrength(IndicatorRunner):
             columns_dict[name] = name
         self.Columns = Enum('Columns', columns_dict)
 
+    def get_lookback(self):
+        return max(self.columns)
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
 
-        df = pd.DataFrame(index=df_quotes.index)
-        for col in self.columns:
-            df['{}{}'.format(self.SMA_COLUMN, col)] = self.factory.create(SMA, period=col).run(symbol, df_quotes)[self.SMA_COLUMN]
+        df_bank = sma_bank(df_quotes.Close, self.columns)
+        df_bank.columns = ['{}{}'.format(self.SMA_COLUMN, col) for col in self.columns]
+        # Rounded like the output of the SMA runners compared against before
+        df = utils.round_df(df_bank, stage=utils.RoundingStage.INDICATOR)
         col_size = len(self.columns)
         df_comparison = df.lt(df_quotes.Close, axis=0)
         df_comparison['CountSMABelowPrice'] = round(100 * (df_comparison.filter(like=self.SMA_COLUMN) == True).astype(int).sum(axis=1) / col_size)
@@ -403,7 +682,7 @@ class TrendStrength(IndicatorRunner):
 
         self.add_direction(df, np.logical_and(df[self.Columns.TREND_STRENGTH.value] >= 100, df[self.Columns.TREND_STRENGTH.value].shift(1) < 100),
                            np.logical_and(df[self.Columns.TREND_STRENGTH.value] <= -100, df_quotes.High < df.filter(like=self.SMA_COLUMN).min(axis=1)))
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
 
@@ -413,6 +692,12 @@ class BollingerBand(IndicatorRunner):
         self.period = period
         self.stdev = stdev
 
+    def get_lookback(self):
+        return self.period - 1
+
+    def get_dependencies(self):
+        return [self.factory.create(SMA, period=self.period), self.factory.create(STDEV, period=self.period)]
+
     def run(self, symbol, df_quotes, df_indicator=None):
         if self.is_updated(df_quotes, df_indicator):
             return df_indicator
@@ -425,9 +710,20 @@ class BollingerBand(IndicatorRunner):
         df['Bottom'] = df_sma.SMA - (df_stdev.STDEV * self.stdev)
 
         self.add_direction(df, df_quotes.Close >= df.Top, df_quotes.High < df.Bottom)
-        df = utils.round_df(df)
+        df = utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
         return df
 
+    def run_panel(self, quotes_panel):
+        df_sma = self.factory.create(SMA, period=self.period).run_panel(quotes_panel)[SMA.Columns.SMA.value]
+        df_stdev = self.factory.create(STDEV, period=self.period).run_panel(quotes_panel)['STDEV']
+        values = collections.OrderedDict()
+        values['Top'] = df_sma + (df_stdev * self.stdev)
+        values['Mid'] = df_sma
+        values['Bottom'] = df_sma - (df_stdev * self.stdev)
+        values[Direction.__name__] = self.panel_direction(quotes_panel, quotes_panel.get_field('Close') >= values['Top'],
+                                                          quotes_panel.get_field('High') < values['Bottom'])
+        return self.round_panel(values)
+
 
 class RSI(IndicatorRunner):
     def __init__(self, period=20, field='Close'):
@@ -474,10 +770,8 @@ class PriceVolumeTrend(IndicatorRunner):
             return df_indicator
 
         df = pd.DataFrame(index=df_quotes.index)
-        df[self.Columns.PVT.value] = (((df_quotes.Close - df_quotes.shift(1).Close) / df_quotes.shift(1).Close) * df_quotes.Volume)
-        for i in df.index.values:
-            if pd.isnull(df[self.Columns.PVT.value].shift(1).loc[i]): continue
-            df.loc[i, self.Columns.PVT.value] = (((df_quotes.Close.loc[i] - df_quotes.Close.shift(1).loc[i]) / df_quotes.Close.shift(1).loc[i]) * df_quotes.Volume.loc[i]) + df[self.Columns.PVT.value].shift(1).loc[i]
+        pvt = ((df_quotes.Close - df_quotes.shift(1).Close) / df_quotes.shift(1).Close) * df_quotes.Volume
+        df[self.Columns.PVT.value] = _segmented_cumsum(pvt.values)
 
         df[self.Columns.FAST_MA.value] = self.factory.create(SMA, period=self.fast, field=self.Columns.PVT.value).run(symbol, df)[SMA.Columns.SMA.value]
         df[self.Columns.SLOW_MA.value] = self.factory.create(SMA, period=self.slow, field=self.Columns.PVT.value).run(symbol, df)[SMA.Columns.SMA.value]
@@ -487,52 +781,397 @@ class PriceVolumeTrend(IndicatorRunner):
         return df
 
 
+class IndicatorResultCache(object):
+    """
+    In-process LRU of runner results keyed by (unique_name, symbol, quotes fingerprint). It is shared by every
+    runner, so a sub-indicator such as SMA_50_Close is computed or read from disk once per process however
+    many composite indicators are built on it.
+    """
+
+    def __init__(self, max_size=config.INDICATOR_MEMORY_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__results__ = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.__results__)
+
+    def get(self, key):
+        if key not in self.__results__:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__results__.move_to_end(key)
+        return self.__results__[key]
+
+    def put(self, key, result):
+        self.__results__[key] = result
+        self.__results__.move_to_end(key)
+        while len(self.__results__) > self.max_size:
+            self.__results__.popitem(last=False)
+
+    def clear(self):
+        self.__results__.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+RESULT_CACHE = IndicatorResultCache()
+
+
+def quotes_row_hashes(df_quotes):
+    return pd.util.hash_pandas_object(df_quotes, index=True).values
+
+
+def quotes_fingerprint(df_quotes, row_hashes=None, rows=None):
+    """
+    md5 of the columns and the first rows (all by default) of df_quotes, e.g. to check that the bars a saved
+    result was computed from are unchanged.
+    """
+    if row_hashes is None:
+        row_hashes = quotes_row_hashes(df_quotes)
+    md5 = hashlib.md5(str(list(df_quotes.columns)).encode())
+    md5.update(row_hashes[:rows].tobytes())
+    return md5.hexdigest()
+
+
+_code_versions = dict()
+
+# Module-level kernels the runners compute and round their results with, hashed into every runner's code version
+RESULT_KERNELS = (_recursive_filter, _segmented_cumsum, sma_bank, utils.roundn, utils._round_values, utils._round,
+                  utils.round_df)
+
+
+def code_version(runner_class):
+    """
+    md5 of the source of runner_class, its base classes and the RESULT_KERNELS, so saved results are recomputed
+    when any of the code that produced them changes.
+    """
+    if runner_class not in _code_versions:
+        md5 = hashlib.md5()
+        for kernel in RESULT_KERNELS:
+            md5.update(inspect.getsource(kernel).encode())
+        for cls in inspect.getmro(runner_class):
+            if cls is object:
+                continue
+            try:
+                md5.update(inspect.getsource(cls).encode())
+            except (OSError, TypeError):
+                md5.update(cls.__qualname__.encode())
+        _code_versions[runner_class] = md5.hexdigest()
+    return _code_versions[runner_class]
+
+
+class IndicatorCacheManifest(object):
+    """
+    JSON index of the results saved under dir_path, be they IndicatorStore records or files. Each entry holds the
+    key of the runner that wrote the result, a digest of the quotes it was computed from, its size and when it was
+    last used. On flush, least recently used results are removed until the total size is within max_bytes.
+    """
+
+    def __init__(self, dir_path, max_bytes=config.INDICATOR_CACHE_MAX_BYTES):
+        self.dir_path = Path(dir_path)
+        self.path = self.dir_path / config.INDICATOR_MANIFEST_FILENAME
+        self.max_bytes = max_bytes
+        self.entries = self.__load__()
+        self.__changed__ = set()
+        self.__dirty__ = False
+
+    def __load__(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    return json.load(f)
+            except ValueError:
+                traceback.print_exc()
+        return dict()
+
+    def get_name(self, file_path):
+        return os.path.relpath(file_path, self.dir_path)
+
+    def get(self, file_path):
+        return self.entries.get(self.get_name(file_path))
+
+    def put(self, file_path, runner_key, quotes, rows, size=None):
+        name = self.get_name(file_path)
+        self.entries[name] = {'runner': runner_key, 'quotes': quotes, 'rows': int(rows),
+                              'size': os.path.getsize(file_path) if size is None else size, 'accessed': time.time()}
+        self.__changed__.add(name)
+        self.__dirty__ = True
+
+    def touch(self, file_path):
+        name = self.get_name(file_path)
+        if name in self.entries:
+            self.entries[name]['accessed'] = time.time()
+            self.__changed__.add(name)
+            self.__dirty__ = True
+
+    def drain(self):
+        """
+        Entries changed since the last drain, for a worker process to hand back to the one that owns the file.
+        """
+        changed = dict((name, self.entries[name]) for name in self.__changed__ if name in self.entries)
+        self.__changed__.clear()
+        return changed
+
+    def merge(self, entries):
+        for name, entry in entries.items():
+            if name not in self.entries or self.entries[name]['accessed'] <= entry['accessed']:
+                self.entries[name] = entry
+                self.__dirty__ = True
+
+    def get_size(self):
+        return sum(entry['size'] for entry in self.entries.values())
+
+    def evict(self):
+        size = self.get_size()
+        for name, entry in sorted(self.entries.items(), key=lambda item: item[1]['accessed']):
+            if size <= self.max_bytes:
+                break
+            file_path = self.dir_path / name
+            print('Evicting {}'.format(file_path))
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+            else:
+                get_store(file_path.parent).remove(file_path.name)
+            del self.entries[name]
+            size -= entry['size']
+
+    def flush(self):
+        if not os.path.exists(self.dir_path):
+            # The cache was wiped, so none of the entries are left
+            self.entries = dict()
+            self.__dirty__ = False
+        if not self.__dirty__:
+            return
+        self.evict()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.__dirty__ = False
+
+
+_manifests = dict()
+
+
+def get_manifest(dir_path):
+    key = os.path.abspath(dir_path)
+    if key not in _manifests:
+        _manifests[key] = IndicatorCacheManifest(dir_path)
+    return _manifests[key]
+
+
+@atexit.register
+def _flush_caches():
+    # Manifests go first since evicting from them removes records from the stores
+    for manifest in _manifests.values():
+        try:
+            manifest.flush()
+        except OSError:
+            traceback.print_exc()
+    flush_stores()
+
+
 class IndicatorRunnerWrapper(object):
-    def __init__(self, dir_path, runner):
+    def __init__(self, dir_path, runner, cache=RESULT_CACHE, manifest=None):
         self.dir_path = dir_path
         self.runner = runner
+        self.cache = cache
+        self.manifest = manifest
+        self.store = get_store(dir_path)
         self.unique_name = runner.unique_name
         self.name = runner.name
         self.Columns = runner.Columns
+        self.__runner_key__ = None
 
     def get_save_path(self, symbol, df_quotes):
-        return self.dir_path / '{}.{}'.format(symbol, config.PICKLE_EXTENSION)
+        """
+        Location of the symbol's record in the store, which is also its name in the manifest.
+        """
+        return self.dir_path / symbol
+
+    def get_runner_key(self):
+        """
+        Hash of what a saved result depends on besides the quotes: the runner parameters, the code of the runner
+        and of its sub-indicators, and the rounding applied to indicators.
+        """
+        if self.__runner_key__ is None:
+            md5 = hashlib.md5(self.unique_name.encode())
+            md5.update(code_version(type(self.runner)).encode())
+            md5.update(str((config.ROUNDING_PLACES.get(utils.RoundingStage.INDICATOR.value),
+                            config.ROUND_ON_OUTPUT_ONLY)).encode())
+            for dependency in self.runner.get_dependencies():
+                md5.update(dependency.get_runner_key().encode())
+            self.__runner_key__ = md5.hexdigest()
+        return self.__runner_key__
+
+    def load(self, symbol, df_quotes, row_hashes):
+        """
+        Saved result for symbol if the manifest shows it was written by this runner from bars that df_quotes
+        still starts with, otherwise None. Without a manifest any saved result is handed to update().
+        """
+        save_path = self.get_save_path(symbol, df_quotes)
+        if not self.store.has(symbol):
+            return None
+        if self.manifest is not None:
+            entry = self.manifest.get(save_path)
+            if entry is None or entry['runner'] != self.get_runner_key() or entry['rows'] > len(row_hashes) or \
+                    entry['quotes'] != quotes_fingerprint(df_quotes, row_hashes, rows=entry['rows']):
+                print('Stale {}'.format(save_path))
+                return None
+            self.manifest.touch(save_path)
+        return self.store.get(symbol)
 
-    def update(self, symbol, df_quotes, df_indicator):
+    def update(self, symbol, df_quotes, df_indicator, row_hashes=None):
         if self.runner.is_updated(df_quotes, df_indicator):
             return df_indicator
 
-        df = self.runner.run(symbol, df_quotes, df_indicator)
+        df = self.__update_tail__(symbol, df_quotes, df_indicator)
+        if df is None:
+            df = self.runner.run(symbol, df_quotes, df_indicator)
+        self.save(symbol, df_quotes, df, row_hashes)
+        return df
+
+    def __update_tail__(self, symbol, df_quotes, df_indicator):
+        lookback = self.runner.get_lookback()
+        if lookback is None or df_indicator is None or len(df_indicator.index) == 0:
+            return None
+        size = len(df_indicator.index)
+        if size >= len(df_quotes.index) or not df_quotes.index[:size].equals(df_indicator.index):
+            return None
+        start = max(0, size - lookback)
+        df_tail = self.runner.detached().run(symbol, df_quotes.iloc[start:])
+        if not df_tail.columns.equals(df_indicator.columns):
+            return None
+        return pd.concat([df_indicator, df_tail.iloc[size - start:]])
+
+    def save(self, symbol, df_quotes, df, row_hashes=None):
         save_path = self.get_save_path(symbol, df_quotes)
-        utils.makedirs(save_path.parent)
         print('Saving {}'.format(save_path))
-        df.to_pickle(save_path)
-        return df
+        size = self.store.put(symbol, df)
+        if self.manifest is not None:
+            self.manifest.put(save_path, self.get_runner_key(), quotes_fingerprint(df_quotes, row_hashes),
+                              len(df_quotes.index), size=size)
 
     def run(self, symbol, df_quotes, df_indicator=None):
-        if os.path.exists(self.get_save_path(symbol, df_quotes)):
-            return self.update(symbol, df_quotes, pd.read_pickle(self.get_save_path(symbol, df_quotes)))
-        else:
-            return self.update(symbol, df_quotes, df_indicator)
+        row_hashes = quotes_row_hashes(df_quotes)
+        key = (self.unique_name, symbol, quotes_fingerprint(df_quotes, row_hashes))
+        df = self.cache.get(key)
+        if df is not None:
+            if not self.store.has(symbol):
+                self.save(symbol, df_quotes, df, row_hashes)
+            elif self.manifest is not None:
+                self.manifest.touch(self.get_save_path(symbol, df_quotes))
+            return df
+        df_saved = self.load(symbol, df_quotes, row_hashes)
+        df = self.update(symbol, df_quotes, df_indicator if df_saved is None else df_saved, row_hashes)
+        self.cache.put(key, df)
+        return df
+
+    def has_panel_kernel(self):
+        return self.runner.has_panel_kernel()
+
+    def get_dependencies(self):
+        return self.runner.get_dependencies()
+
+    def get_panel_save_path(self):
+        return self.dir_path / '{}.{}'.format(config.INDICATOR_PANEL_NAME, config.PICKLE_EXTENSION)
+
+    def run_panel(self, quotes_panel):
+        key = (self.unique_name, None, quotes_panel.fingerprint())
+        values = self.cache.get(key)
+        if values is not None:
+            if not os.path.exists(self.get_panel_save_path()):
+                self.save_panel(quotes_panel, values)
+            elif self.manifest is not None:
+                self.manifest.touch(self.get_panel_save_path())
+            return values
+        values = self.__run_panel__(quotes_panel)
+        self.cache.put(key, values)
+        return values
+
+    def __run_panel__(self, quotes_panel):
+        save_path = self.get_panel_save_path()
+        values = None
+        if os.path.exists(save_path):
+            saved = pd.read_pickle(save_path)
+            if self.__is_panel_prefix__(quotes_panel, saved):
+                if self.manifest is not None:
+                    self.manifest.touch(save_path)
+                if np.array_equal(saved['dates'].view('i8'), quotes_panel.dates.view('i8')):
+                    return saved['values']
+                values = self.__update_panel_tail__(quotes_panel, saved)
+            else:
+                print('Stale {}'.format(save_path))
+
+        if values is None:
+            values = self.runner.run_panel(quotes_panel)
+        self.save_panel(quotes_panel, values)
+        return values
+
+    def __is_panel_prefix__(self, quotes_panel, saved):
+        dates = saved['dates']
+        if saved['symbols'] != quotes_panel.symbols or len(dates) > len(quotes_panel.dates):
+            return False
+        saved_bars = ~np.isnat(dates)
+        if not np.array_equal(dates[saved_bars].view('i8'), quotes_panel.dates[:len(dates)][saved_bars].view('i8')):
+            return False
+        if self.manifest is None:
+            return True
+        entry = self.manifest.get(self.get_panel_save_path())
+        return entry is not None and entry['runner'] == self.get_runner_key() and \
+            entry['quotes'] == quotes_panel.digest(saved_bars)
+
+    def __update_panel_tail__(self, quotes_panel, saved):
+        lookback = self.runner.get_lookback()
+        dates = saved['dates']
+        if lookback is None or len(dates) == 0:
+            return None
+        saved_bars = ~np.isnat(dates)
+        # Rows below the shortest saved history hold the same bars for every symbol, so only the rest is rerun
+        size = saved_bars.sum(axis=0).min()
+        start = max(0, size - lookback)
+        tail = self.runner.detached().run_panel(quotes_panel.tail(start))
+        if list(tail.keys()) != list(saved['values'].keys()):
+            return None
+        return collections.OrderedDict(
+            (col, pd.concat([saved['values'][col].iloc[:size], df.iloc[size - start:]], ignore_index=True))
+            for col, df in tail.items())
+
+    def save_panel(self, quotes_panel, values):
+        save_path = self.get_panel_save_path()
+        utils.makedirs(save_path.parent)
+        print('Saving {}'.format(save_path))
+        pd.to_pickle({'symbols': quotes_panel.symbols, 'dates': quotes_panel.dates, 'values': values}, save_path)
+        if self.manifest is not None:
+            self.manifest.put(save_path, self.get_runner_key(), quotes_panel.digest(~np.isnat(quotes_panel.dates)),
+                              len(quotes_panel.dates))
 
 
 class DefaultIndicatorRunnerFactory(IndicatorRunnerFactory):
-    def __init__(self, dir_path: Path):
+    def __init__(self, dir_path: Path, cache=RESULT_CACHE):
         self.dir_path = dir_path
+        self.cache = cache
+        self.manifest = get_manifest(dir_path)
 
     def create(self, cls, *args, **kwargs):
-        runner = cls(*args, **kwargs)
-        runner.factory = DefaultIndicatorRunnerFactory(self.dir_path)
+        return self.wrap(cls(*args, **kwargs))
+
+    def wrap(self, runner):
+        runner.factory = DefaultIndicatorRunnerFactory(self.dir_path, cache=self.cache)
         save_path = self.dir_path / runner.unique_name
-        return IndicatorRunnerWrapper(save_path, runner)
+        return IndicatorRunnerWrapper(save_path, runner, cache=self.cache, manifest=self.manifest)
 
 
 class Attribute(entity.Attribute):
-    def __init__(self, df_values):
-        self.df_values = df_values
+    def __init__(self, df_values, read_only=False):
+        self.read_only = read_only
+        self.df_values = utils.read_only_df(df_values) if read_only else df_values
 
     def get_value(self, date=None, symbol=None, start=None):
-        df = self.df_values.copy()
+        df = self.df_values if self.read_only else self.df_values.copy()
         if symbol is not None:
             df = df[symbol].dropna()
 
@@ -551,7 +1190,7 @@ class Attribute(entity.Attribute):
         return df
 
     def get_indices(self, symbol=None, start=None, end=None):
-        df = self.df_values.copy()
+        df = self.df_values if self.read_only else self.df_values.copy()
         df = df.loc[start:] if start is not None else df
         df = df.loc[:end] if end is not None else df
         if symbol is None:
@@ -559,6 +1198,62 @@ class Attribute(entity.Attribute):
         return df[symbol].dropna().index.values
 
 
+class AttributeBuilder(object):
+    """
+    Collects the result of each symbol and assembles every column into one (date, symbol) matrix on the union
+    of their dates, allocated once and filled symbol by symbol.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.frames = []
+
+    def add(self, symbol, df):
+        self.symbols.append(symbol)
+        self.frames.append(df)
+
+    def get_index(self):
+        indices = [df.index for df in self.frames]
+        if len(indices) == 1 or all(index.equals(indices[0]) for index in indices[1:]):
+            return indices[0]
+        return indices[0].append(indices[1:]).unique().sort_values()
+
+    def build_values(self, col, index):
+        symbols = [symbol for symbol, df in zip(self.symbols, self.frames) if col in df.columns]
+        columns = [df[col] for df in self.frames if col in df.columns]
+        positions = [None if column.index.equals(index) else index.get_indexer(column.index) for column in columns]
+        dtypes = [column.dtype for column in columns]
+        # Extension dtypes (e.g. strings) have no numpy promotion, so they are gathered as objects
+        dtype = np.result_type(*dtypes) if all(isinstance(_, np.dtype) for _ in dtypes) else np.dtype(object)
+        if any(position is not None for position in positions) and dtype.kind in 'biu':
+            dtype = np.dtype(object) if dtype.kind == 'b' else np.dtype(float)
+        # Symbols are rows here so that each symbol's column of the frame below is contiguous
+        values = np.empty((len(symbols), len(index)), dtype=dtype)
+        if any(position is not None for position in positions):
+            values.fill(np.nan)
+        for row, (column, position) in enumerate(zip(columns, positions)):
+            if position is None:
+                values[row] = column.values
+            else:
+                values[row, position] = column.values
+        return pd.DataFrame(values.T, index=index, columns=symbols)
+
+    def build(self, read_only=False):
+        attributes = dict()
+        if len(self.frames) == 0:
+            return attributes
+        index = self.get_index()
+        cols = []
+        for df in self.frames:
+            cols += [col for col in df.columns if col not in cols]
+        for col in cols:
+            df_values = self.build_values(col, index)
+            if read_only:
+                df_values = utils.read_only_df(df_values, copy=False)
+            attributes[col] = Attribute(df_values, read_only=read_only)
+        return attributes
+
+
 class Indicator(entity.Indicator):
     def __init__(self, name, *attributes: Attribute):
         super().__init__(name, attributes)
@@ -591,29 +1286,105 @@ class IndicatorFactory(object):
         raise NotImplementedError
 
 
+_worker_market = None
+_worker_runner = None
+
+
+def _init_worker(market, dir_path, runner):
+    global _worker_market, _worker_runner
+    _worker_market = market
+    _worker_runner = DefaultIndicatorRunnerFactory(dir_path).wrap(runner)
+    _worker_runner.manifest.drain()
+    drain_stores()
+
+
+def _run_symbol(symbol):
+    df_quotes = _worker_market.get_quotes(symbol=symbol)
+    if df_quotes.empty:
+        return symbol, None, dict(), dict()
+    df = _worker_runner.run(symbol, df_quotes)
+    return symbol, df, _worker_runner.manifest.drain(), drain_stores()
+
+
+def _pool_context():
+    # Forked workers inherit the market as shared copy-on-write memory instead of unpickling a copy each
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
 class DefaultIndicatorFactory(IndicatorFactory):
-    def __init__(self, dir_path: Path, market: Market):
+    def __init__(self, dir_path: Path, market: Market, read_only=False, processes=1):
         self.dir_path = dir_path
         self.market = market
+        self.read_only = read_only
+        self.processes = processes
         self.runner_factory = DefaultIndicatorRunnerFactory(dir_path)
+        self.__quotes_panel__ = None
+        self.__quotes_panel_key__ = None
+
+    def get_quotes_panel(self):
+        dates = self.market.get_dates()
+        key = (len(dates), dates[-1] if len(dates) > 0 else None, tuple(self.market.get_symbols()))
+        if self.__quotes_panel_key__ != key:
+            self.__quotes_panel__ = market_to_quotes_panel(self.market)
+            self.__quotes_panel_key__ = key
+        return self.__quotes_panel__
+
+    def __run_symbols__(self, runner, panel=True):
+        if panel and runner.has_panel_kernel():
+            quotes_panel = self.get_quotes_panel()
+            for symbol, df in quotes_panel.unpack(runner.run_panel(quotes_panel)):
+                yield symbol, df
+        elif self.processes == 1:
+            for symbol in self.market.get_symbols():
+                df_quotes = self.market.get_quotes(symbol=symbol)
+                if df_quotes.empty:
+                    continue
+                yield symbol, runner.run(symbol, df_quotes)
+        else:
+            for symbol, df in self.__run_symbols_in_pool__(runner):
+                yield symbol, df
+
+    def __run_symbols_in_pool__(self, runner):
+        """
+        Runs the symbols across worker processes. Each worker gets the market once through the pool initializer
+        and wraps a detached copy of the runner, so tasks carry only a symbol. Results come back in symbol
+        order, so the merged indicator is the same as a serial run.
+        """
+        symbols = self.market.get_symbols()
+        processes = self.processes or multiprocessing.cpu_count()
+        chunksize = max(1, len(symbols) // (processes * 4))
+        with _pool_context().Pool(processes, initializer=_init_worker,
+                                  initargs=(self.market, self.runner_factory.dir_path, runner.runner.detached())) as pool:
+            for symbol, df, entries, records in pool.imap(_run_symbol, symbols, chunksize=chunksize):
+                merge_stores(records)
+                self.runner_factory.manifest.merge(entries)
+                if df is not None:
+                    yield symbol, df
+
+    def run_runner(self, runner, panel=True):
+        """
+        Runs runner for all symbols in the market only to save its results, e.g. for an indicator that others
+        depend on, and records them in the manifest and stores like create_by_runner_instance. With panel=False
+        it runs symbol by symbol even if it has a panel kernel, for dependents that read it that way.
+        """
+        print('Running {} for all symbols in the market...'.format(runner.unique_name))
+        for _ in self.__run_symbols__(runner, panel=panel):
+            pass
+        self.runner_factory.manifest.flush()
+        flush_stores()
+        print('Finished running {} for all symbols in the market.'.format(runner.unique_name))
 
     def create_by_runner_instance(self, runner):
         indicator = Indicator(runner.unique_name, dict())
         print('Running {} for all symbols in the market...'.format(runner.unique_name))
-        for symbol in self.market.get_symbols():
-            df_quotes = self.market.get_quotes(symbol=symbol)
-            if df_quotes.empty:
-                continue
-            df = runner.run(symbol, df_quotes)
-            for col in df.columns:
-                if not type(indicator.attributes) == dict:
-                    indicator.attributes = dict()
-                indicator.attributes[col] = indicator.get_attribute(col) or Attribute(pd.DataFrame())
-                df_symbol = pd.DataFrame()
-                df_symbol[symbol] = df[col]
-                indicator.get_attribute(col).df_values = indicator.get_attribute(col).df_values.join(df_symbol, how='outer')
-                indicator.get_attribute(col).df_values.sort_index()
-
+        builder = AttributeBuilder()
+        for symbol, df in self.__run_symbols__(runner):
+            builder.add(symbol, df)
+        indicator.attributes = builder.build(read_only=self.read_only)
+        self.runner_factory.manifest.flush()
+        flush_stores()
         print('Finished running {} for all symbols in the market.'.format(runner.unique_name))
         return indicator
 
@@ -0,0 +1,145 @@
+import collections
+
+from poor_trader.screening import indicator
+
+
+class PlanNode(object):
+    def __init__(self, runner):
+        self.runner = runner
+        self.name = runner.unique_name
+        self.dependencies = []
+        self.requested = False
+        self.executed = False
+        self.indicator = None
+
+
+class PlannedIndicator(indicator.Indicator):
+    """
+    Stands in for an indicator requested from an IndicatorPlanner. Its attributes are filled in when the plan
+    is executed, which the getters below do on first use. Reading attributes directly before that raises.
+    """
+
+    def __init__(self, planner, name):
+        super().__init__(name)
+        self.planner = planner
+        self.__attributes__ = None
+
+    @property
+    def attributes(self):
+        if self.__attributes__ is None:
+            raise RuntimeError('{} has not been run yet, execute its IndicatorPlanner first.'.format(self.name))
+        return self.__attributes__
+
+    @attributes.setter
+    def attributes(self, attributes):
+        self.__attributes__ = attributes
+
+    def __resolve__(self):
+        if not self.planner.is_executed():
+            self.planner.execute()
+
+    def get_attribute(self, key):
+        self.__resolve__()
+        return super().get_attribute(key)
+
+    def get_attribute_keys(self):
+        self.__resolve__()
+        return super().get_attribute_keys()
+
+    def get_attributes(self):
+        self.__resolve__()
+        return super().get_attributes()
+
+
+class IndicatorPlanner(indicator.IndicatorFactory):
+    """
+    Collects indicator requests instead of running them, so that every unique runner, sub-indicators included,
+    is run once and in dependency order however many strategies ask for it.
+    """
+
+    def __init__(self, factory: indicator.DefaultIndicatorFactory):
+        self.factory = factory
+        self.runner_factory = factory.runner_factory
+        self.__nodes__ = collections.OrderedDict()
+        self.__indicators__ = dict()
+
+    def __add_node__(self, runner):
+        if runner.unique_name not in self.__nodes__:
+            node = PlanNode(runner)
+            self.__nodes__[node.name] = node
+            for dependency in runner.get_dependencies():
+                node.dependencies.append(self.__add_node__(dependency).name)
+        return self.__nodes__[runner.unique_name]
+
+    def create_by_runner_instance(self, runner):
+        node = self.__add_node__(runner)
+        node.requested = True
+        if node.name not in self.__indicators__:
+            self.__indicators__[node.name] = PlannedIndicator(self, node.name)
+        return self.__indicators__[node.name]
+
+    def create_by_unique_name(self, unique_name):
+        return self.create_by_runner_instance(self.runner_factory.create_by_unique_name(unique_name))
+
+    def create(self, runner_class, *args, **kwargs):
+        return self.create_by_runner_instance(self.runner_factory.create(runner_class, *args, **kwargs))
+
+    def get_plan(self):
+        plan = []
+        planned = set()
+        visiting = set()
+
+        def visit(node):
+            if node.name in planned:
+                return
+            if node.name in visiting:
+                raise ValueError('Circular indicator dependency on {}'.format(node.name))
+            visiting.add(node.name)
+            for name in node.dependencies:
+                visit(self.__nodes__[name])
+            visiting.remove(node.name)
+            planned.add(node.name)
+            plan.append(node)
+
+        for node in self.__nodes__.values():
+            visit(node)
+        return plan
+
+    def is_executed(self):
+        return all(node.executed and (node.indicator is not None or not node.requested)
+                   for node in self.__nodes__.values())
+
+    def execute(self):
+        for node in self.get_plan():
+            if node.requested and node.indicator is None:
+                node.indicator = self.factory.create_by_runner_instance(node.runner)
+                self.__indicators__[node.name].attributes = node.indicator.attributes
+            elif not node.executed:
+                self.factory.run_runner(node.runner, panel=self.__is_panel_run__(node))
+            node.executed = True
+
+    def __is_panel_run__(self, node):
+        """
+        Whether node runs through its panel kernel. Dependents without one call their dependencies symbol by
+        symbol, so a dependency-only node is run in that form unless every dependent reads it as a panel.
+        """
+        if not node.runner.has_panel_kernel():
+            return False
+        if node.requested:
+            return True
+        return all(self.__is_panel_run__(dependent) for dependent in self.__nodes__.values()
+                   if node.name in dependent.dependencies)
+
+    def report(self):
+        plan = self.get_plan()
+        lines = ['Indicator plan: {} runners, {} requested'.format(len(plan), len([_ for _ in plan if _.requested]))]
+        for i, node in enumerate(plan):
+            line = '{:>4}. {}'.format(i + 1, node.name)
+            if node.dependencies:
+                line += ' <- {}'.format(', '.join(node.dependencies))
+            if node.requested:
+                line += ' [requested]'
+            if node.executed:
+                line += ' [done]'
+            lines.append(line)
+        return '\n'.join(lines)
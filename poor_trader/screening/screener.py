@@ -6,7 +6,7 @@ from poor_trader.screening.entity import Direction, Screener
 
 
 class DataFrameScreener(Screener):
-    def __init__(self, _market: market.DataFrameMarket, indicators_path):
+    def __init__(self, _market: market.Market, indicators_path):
         self.market = _market
         self.indicators_path = indicators_path
 
@@ -26,7 +26,8 @@ class DataFrameScreener(Screener):
         if end is not None:
             raise NotImplementedError
         min_bars = self.get_minimum_trading_periods() + 5
-        return market.DataFrameMarket(self.market.__df_historical_data__.iloc[-min_bars:])
+        dates = self.market.get_dates()[-min_bars:]
+        return self.market.trim(start=dates[0] if len(dates) > 0 else None)
 
     def create_indicators(self, start=None, end=None):
         indicators = []
@@ -0,0 +1,240 @@
+import collections
+import json
+import os
+import pickle
+import traceback
+
+import numpy as np
+import pandas as pd
+from path import Path
+
+from poor_trader import config, utils
+from poor_trader.screening.entity import Direction
+
+DIRECTIONS = np.array(['', Direction.LONG, Direction.SHORT], dtype=object)
+
+RECORD_ALIGNMENT = 8
+
+
+def _encode_column(values):
+    """
+    Returns (kind, array) for one column of a result. Numbers and dates are stored as they are, Direction
+    columns as int8 codes and anything else as a pickle.
+    """
+    if values.dtype.kind in 'biufcmM':
+        return values.dtype.str, np.ascontiguousarray(values)
+    codes = np.full(len(values), -1, dtype=np.int8)
+    for code, direction in enumerate(DIRECTIONS):
+        codes[values == direction] = code
+    if (codes >= 0).all():
+        return Direction.__name__, codes
+    return 'pickle', np.frombuffer(pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+
+def _decode_column(kind, buffer, rows):
+    if kind == Direction.__name__:
+        return DIRECTIONS[np.frombuffer(buffer, dtype=np.int8, count=rows)]
+    if kind == 'pickle':
+        return pickle.loads(buffer.tobytes())
+    return np.frombuffer(buffer, dtype=np.dtype(kind), count=rows)
+
+
+def _data_filename(generation):
+    if generation == 0:
+        return config.INDICATOR_STORE_FILENAME
+    name, extension = os.path.splitext(config.INDICATOR_STORE_FILENAME)
+    return '{}.{}{}'.format(name, generation, extension)
+
+
+class IndicatorStore(object):
+    """
+    Results of one indicator for every symbol in a single append-only file. Each record holds the index and the
+    columns of one symbol back to back, and a JSON index maps symbols to their record offsets. The data file is
+    memory-mapped once, so loading the whole market is one mapped read instead of a file per symbol.
+    """
+
+    def __init__(self, dir_path):
+        self.dir_path = Path(dir_path)
+        self.index_path = self.dir_path / config.INDICATOR_STORE_INDEX_FILENAME
+        self.generation, self.records = self.__load_index__()
+        self.data_path = self.dir_path / _data_filename(self.generation)
+        self.__changed__ = set()
+        self.__dirty__ = False
+        self.__data__ = None
+        self.__data_inode__ = None
+        self.__writer__ = None
+        self.__writer_pid__ = None
+
+    def __load_index__(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f, object_pairs_hook=collections.OrderedDict)
+                if os.path.exists(self.dir_path / _data_filename(index['generation'])):
+                    return index['generation'], index['records']
+            except (ValueError, KeyError):
+                traceback.print_exc()
+        return 0, collections.OrderedDict()
+
+    def get_symbols(self):
+        return list(self.records.keys())
+
+    def has(self, symbol):
+        return symbol in self.records and (self.__data__ is not None or os.path.exists(self.data_path))
+
+    def get_size(self, symbol):
+        return self.records[symbol]['size']
+
+    def __map__(self, end):
+        if self.__data__ is not None and len(self.__data__) >= end and not os.path.exists(self.data_path):
+            # Another process compacted the file away, but the pages mapped before it was removed stay readable
+            return self.__data__
+        inode = os.stat(self.data_path).st_ino
+        if self.__data__ is None or self.__data_inode__ != inode or len(self.__data__) < end:
+            self.__data__ = np.memmap(self.data_path, dtype=np.uint8, mode='r')
+            self.__data_inode__ = inode
+        return self.__data__
+
+    def get(self, symbol):
+        if not self.has(symbol):
+            return None
+        record = self.records[symbol]
+        # An empty result has nothing to map, and an empty file cannot be mapped
+        data = self.__map__(record['offset'] + record['size']) if record['size'] > 0 else np.zeros(0, dtype=np.uint8)
+        rows = record['rows']
+        arrays = []
+        for name, kind, start, end in record['columns']:
+            arrays.append(_decode_column(kind, data[record['offset'] + start:record['offset'] + end], rows))
+        index = pd.Index(arrays[0], name=record['index_name'])
+        names = [column[0] for column in record['columns'][1:]]
+        return pd.DataFrame(collections.OrderedDict(zip(names, arrays[1:])), index=index, columns=names)
+
+    def __write__(self, data):
+        if not os.path.exists(self.data_path):
+            # The data file was removed along with every record in it
+            self.__close__()
+            self.records.clear()
+        if self.__writer_pid__ != os.getpid():
+            # Each process appends through its own file description, so the offset it reads back is its own
+            utils.makedirs(self.dir_path)
+            self.__writer__ = open(self.data_path, 'ab')
+            self.__writer_pid__ = os.getpid()
+        self.__writer__.write(data)
+        self.__writer__.flush()
+        return self.__writer__.tell() - len(data)
+
+    def put(self, symbol, df):
+        columns = []
+        buffers = []
+        size = 0
+        for name, values in [(None, df.index.values)] + [(col, df[col].values) for col in df.columns]:
+            kind, array = _encode_column(values)
+            buffer = array.tobytes()
+            padding = -len(buffer) % RECORD_ALIGNMENT
+            columns.append([name, kind, size, size + len(buffer)])
+            buffers.append(buffer + b'\0' * padding)
+            size += len(buffer) + padding
+        offset = self.__write__(b''.join(buffers))
+        self.records[symbol] = {'offset': offset, 'size': size, 'rows': len(df.index),
+                                'index_name': df.index.name, 'columns': columns}
+        self.__changed__.add(symbol)
+        self.__dirty__ = True
+        return size
+
+    def remove(self, symbol):
+        if self.records.pop(symbol, None) is not None:
+            self.__dirty__ = True
+
+    def drain(self):
+        """
+        Records written since the last drain, for a worker process to hand back to the one that owns the index.
+        """
+        changed = dict((symbol, self.records[symbol]) for symbol in self.__changed__ if symbol in self.records)
+        self.__changed__.clear()
+        return changed
+
+    def merge(self, records):
+        if len(records) > 0:
+            self.records.update(records)
+            self.__dirty__ = True
+
+    def compact(self):
+        """
+        Copies the live records into the data file of the next generation once replaced or removed ones take up
+        most of the current one, and returns the path of the file it replaced. The old file is left in place, so
+        a process still holding the old index keeps reading the offsets it knows until flush removes it.
+        """
+        if not os.path.exists(self.data_path):
+            return None
+        live = sum(record['size'] for record in self.records.values())
+        file_size = os.path.getsize(self.data_path)
+        if file_size <= 2 * live:
+            return None
+        data = self.__map__(file_size)
+        generation = self.generation + 1
+        data_path = self.dir_path / _data_filename(generation)
+        records = collections.OrderedDict()
+        offset = 0
+        with open(data_path + '.tmp', 'wb') as f:
+            for symbol, record in self.records.items():
+                f.write(data[record['offset']:record['offset'] + record['size']].tobytes())
+                records[symbol] = dict(record, offset=offset)
+                offset += record['size']
+        os.replace(data_path + '.tmp', data_path)
+        stale_path = self.data_path
+        self.__close__()
+        self.generation, self.records, self.data_path = generation, records, data_path
+        return stale_path
+
+    def __close__(self):
+        if self.__writer__ is not None and self.__writer_pid__ == os.getpid():
+            self.__writer__.close()
+        self.__writer__ = None
+        self.__writer_pid__ = None
+        self.__data__ = None
+        self.__data_inode__ = None
+
+    def flush(self):
+        if not os.path.exists(self.dir_path):
+            # The cache was wiped, so none of the records are left
+            self.records = collections.OrderedDict()
+            self.__close__()
+            self.__dirty__ = False
+        if not self.__dirty__:
+            return
+        stale_path = self.compact()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'generation': self.generation, 'records': self.records}, f)
+        os.replace(tmp_path, self.index_path)
+        self.__dirty__ = False
+        if stale_path is not None and os.path.exists(stale_path):
+            # Processes that mapped it keep their pages, and any that had not see the records as missing
+            os.remove(stale_path)
+
+
+_stores = dict()
+
+
+def get_store(dir_path):
+    key = os.path.abspath(dir_path)
+    if key not in _stores:
+        _stores[key] = IndicatorStore(dir_path)
+    return _stores[key]
+
+
+def drain_stores():
+    return dict((key, store.drain()) for key, store in _stores.items())
+
+
+def merge_stores(records):
+    for key, changed in records.items():
+        get_store(key).merge(changed)
+
+
+def flush_stores():
+    for store in _stores.values():
+        try:
+            store.flush()
+        except OSError:
+            traceback.print_exc()
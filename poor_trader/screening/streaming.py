@@ -0,0 +1,413 @@
+import abc
+import collections
+import inspect
+import math
+
+import pandas as pd
+
+from poor_trader import config, utils
+from poor_trader.screening import indicator
+from poor_trader.screening.entity import Direction
+
+
+def _round(value):
+    places = config.ROUNDING_PLACES.get(utils.RoundingStage.INDICATOR.value, 4)
+    if places is None or config.ROUND_ON_OUTPUT_ONLY:
+        return value
+    return utils.roundn(value, places)
+
+
+def _direction(long_condition, short_condition):
+    return Direction.LONG if long_condition else Direction.SHORT if short_condition else ''
+
+
+class _RollingMean(object):
+    """
+    Mean of the last `window` values, NaN until the window holds that many non-NaN values. Values are added to and
+    removed from a compensated running sum the way pandas >= 1.x rolling mean does it. Other pandas versions,
+    e.g. the 0.22 in requirements.txt, can differ in the last bits, so a price within those bits of the mean
+    can get a different Direction than the batch runner gives it.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.set_state(None)
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self.__remove_value__(self.values.popleft())
+        self.values.append(value)
+        self.__add_value__(value)
+        if self.nobs < self.window or self.nobs == 0:
+            return float('nan')
+        if self.same >= self.nobs:
+            return self.prev
+        result = self.sum / self.nobs
+        if self.negatives == 0 and result < 0:
+            return 0.
+        if self.negatives == self.nobs and result > 0:
+            return 0.
+        return result
+
+    def __add_value__(self, value):
+        if value != value:
+            return
+        self.nobs += 1
+        y = value - self.add_compensation
+        t = self.sum + y
+        self.add_compensation = t - self.sum - y
+        self.sum = t
+        if math.copysign(1., value) < 0:
+            self.negatives += 1
+        self.same = self.same + 1 if value == self.prev or self.prev is None else 1
+        self.prev = value
+
+    def __remove_value__(self, value):
+        if value != value:
+            return
+        self.nobs -= 1
+        y = -value - self.remove_compensation
+        t = self.sum + y
+        self.remove_compensation = t - self.sum - y
+        self.sum = t
+        if math.copysign(1., value) < 0:
+            self.negatives -= 1
+
+    def get_state(self):
+        return {'values': list(self.values), 'nobs': self.nobs, 'sum': self.sum, 'negatives': self.negatives,
+                'add_compensation': self.add_compensation, 'remove_compensation': self.remove_compensation,
+                'same': self.same, 'prev': self.prev}
+
+    def set_state(self, state):
+        state = state or {}
+        self.values = collections.deque(state.get('values', []), maxlen=self.window)
+        self.nobs = state.get('nobs', 0)
+        self.sum = state.get('sum', 0.)
+        self.negatives = state.get('negatives', 0)
+        self.add_compensation = state.get('add_compensation', 0.)
+        self.remove_compensation = state.get('remove_compensation', 0.)
+        self.same = state.get('same', 0)
+        self.prev = state.get('prev', None)
+
+
+class _RollingVariance(object):
+    """
+    Sample variance of the last `window` values from Welford updates as values enter and leave the window, the way
+    pandas >= 1.x rolling var does it, with the same caveat as _RollingMean.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.set_state(None)
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self.__remove_value__(self.values.popleft())
+        self.values.append(value)
+        self.__add_value__(value)
+        if self.nobs < self.window or self.nobs <= 1:
+            return float('nan')
+        if self.same >= self.nobs:
+            return 0.
+        return max(self.ssqdm / (self.nobs - 1), 0.)
+
+    def __add_value__(self, value):
+        if value != value:
+            return
+        self.same = self.same + 1 if value == self.prev or self.prev is None else 1
+        self.prev = value
+        self.nobs += 1
+        prev_mean = self.mean - self.add_compensation
+        y = value - self.add_compensation
+        t = y - self.mean
+        self.add_compensation = t + self.mean - y
+        self.mean += t / self.nobs
+        self.ssqdm += (value - prev_mean) * (value - self.mean)
+
+    def __remove_value__(self, value):
+        if value != value:
+            return
+        self.nobs -= 1
+        if self.nobs == 0:
+            self.mean = 0.
+            self.ssqdm = 0.
+            return
+        prev_mean = self.mean - self.remove_compensation
+        y = value - self.remove_compensation
+        t = y - self.mean
+        self.remove_compensation = t + self.mean - y
+        self.mean -= t / self.nobs
+        self.ssqdm -= (value - prev_mean) * (value - self.mean)
+
+    def get_state(self):
+        return {'values': list(self.values), 'nobs': self.nobs, 'mean': self.mean, 'ssqdm': self.ssqdm,
+                'add_compensation': self.add_compensation, 'remove_compensation': self.remove_compensation,
+                'same': self.same, 'prev': self.prev}
+
+    def set_state(self, state):
+        state = state or {}
+        self.values = collections.deque(state.get('values', []), maxlen=self.window)
+        self.nobs = state.get('nobs', 0)
+        self.mean = state.get('mean', 0.)
+        self.ssqdm = state.get('ssqdm', 0.)
+        self.add_compensation = state.get('add_compensation', 0.)
+        self.remove_compensation = state.get('remove_compensation', 0.)
+        self.same = state.get('same', 0)
+        self.prev = state.get('prev', None)
+
+
+class _RollingExtreme(object):
+    """
+    Max (or min) of the last `window` values from a monotonic deque of (bar, value) pairs, NaN while the window
+    is short or holds a NaN.
+    """
+
+    def __init__(self, window, maximum=True):
+        self.window = window
+        self.maximum = maximum
+        self.set_state(None)
+
+    def push(self, value):
+        self.bar += 1
+        if value != value:
+            self.last_nan = self.bar
+        else:
+            while self.candidates and (self.candidates[-1][1] <= value if self.maximum
+                                       else self.candidates[-1][1] >= value):
+                self.candidates.pop()
+            self.candidates.append([self.bar, value])
+        while self.candidates and self.candidates[0][0] <= self.bar - self.window:
+            self.candidates.popleft()
+        if self.bar < self.window or self.bar - self.last_nan < self.window:
+            return float('nan')
+        return self.candidates[0][1]
+
+    def get_state(self):
+        return {'bar': self.bar, 'last_nan': self.last_nan, 'candidates': [list(_) for _ in self.candidates]}
+
+    def set_state(self, state):
+        state = state or {}
+        self.bar = state.get('bar', 0)
+        self.last_nan = state.get('last_nan', -self.window)
+        self.candidates = collections.deque([list(_) for _ in state.get('candidates', [])])
+
+
+class StreamingIndicator(object):
+    """
+    Incremental counterpart of an IndicatorRunner for bars that arrive one at a time. seed() runs over the history
+    once and update() then takes each new bar in constant time, both returning the columns, Direction included,
+    that the runner's run() would, up to the last bits noted on _RollingMean. get_state() snapshots everything
+    update() needs, for set_state() to pick up where it left off, e.g. in another process.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    fields = ()
+    columns = ()
+
+    def __init__(self, runner):
+        self.unique_name = runner.unique_name
+        self.reset()
+
+    @abc.abstractmethod
+    def reset(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __step__(self, *values):
+        """
+        Takes the fields of one bar and returns the unrounded values of the columns, Direction last.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_state(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_state(self, state):
+        raise NotImplementedError
+
+    def seed(self, df_quotes):
+        self.reset()
+        rows = [self.__step__(*values) for values in df_quotes[list(self.fields)].values.tolist()]
+        columns = list(zip(*rows)) if rows else [[]] * len(self.columns)
+        df = pd.DataFrame(index=df_quotes.index)
+        for col, values in zip(self.columns, columns):
+            if col == Direction.__name__:
+                df[col] = pd.Series(list(values), index=df_quotes.index, dtype=object)
+            else:
+                df[col] = pd.Series(list(values), index=df_quotes.index, dtype=float)
+        return utils.round_df(df, stage=utils.RoundingStage.INDICATOR)
+
+    def update(self, bar, date=None):
+        row = self.__step__(*[bar[field] for field in self.fields])
+        values = [value if col == Direction.__name__ else _round(value) for col, value in zip(self.columns, row)]
+        return pd.Series(values, index=self.columns, name=getattr(bar, 'name', None) if date is None else date)
+
+
+class StreamingSMA(StreamingIndicator):
+    columns = (indicator.SMA.Columns.SMA.value, Direction.__name__)
+
+    def __init__(self, period=10, field='Close'):
+        self.period = period
+        self.field = field
+        self.fields = (field, )
+        super().__init__(indicator.SMA(period=period, field=field))
+
+    def reset(self):
+        self.sma = _RollingMean(self.period)
+
+    def __step__(self, price):
+        sma = self.sma.push(price)
+        return sma, _direction(price > sma, price < sma)
+
+    def get_state(self):
+        return {'sma': self.sma.get_state()}
+
+    def set_state(self, state):
+        self.sma.set_state(state['sma'])
+
+
+class StreamingSTDEV(StreamingIndicator):
+    columns = ('STDEV', Direction.__name__)
+
+    def __init__(self, period=10, field='Close'):
+        self.period = period
+        self.field = field
+        self.fields = (field, )
+        super().__init__(indicator.STDEV(period=period, field=field))
+
+    def reset(self):
+        self.variance = _RollingVariance(self.period)
+
+    def __step__(self, price):
+        stdev = math.sqrt(self.variance.push(price))
+        return stdev, _direction(price > stdev, price < stdev)
+
+    def get_state(self):
+        return {'variance': self.variance.get_state()}
+
+    def set_state(self, state):
+        self.variance.set_state(state['variance'])
+
+
+class StreamingEMA(StreamingIndicator):
+    """
+    Seeded with the (rounded) SMA of the first full period like EMA, after which a NaN price ends the series.
+    """
+    columns = ('EMA', Direction.__name__)
+
+    def __init__(self, period=10, field='Close'):
+        self.period = period
+        self.field = field
+        self.fields = (field, )
+        super().__init__(indicator.EMA(period=period, field=field))
+
+    def reset(self):
+        self.sma = _RollingMean(self.period)
+        self.seeded = False
+        self.ema = float('nan')
+
+    def __step__(self, price):
+        if not self.seeded:
+            sma = self.sma.push(price)
+            if not math.isnan(sma):
+                self.ema = _round(sma)
+                self.seeded = True
+        elif not math.isnan(self.ema):
+            c = 2. / (self.period + 1.)
+            self.ema = c * price + (1. - c) * self.ema
+        return self.ema, _direction(price > self.ema, price < self.ema)
+
+    def get_state(self):
+        return {'sma': self.sma.get_state(), 'seeded': self.seeded, 'ema': self.ema}
+
+    def set_state(self, state):
+        self.sma.set_state(state['sma'])
+        self.seeded = state['seeded']
+        self.ema = state['ema']
+
+
+class StreamingATR(StreamingIndicator):
+    columns = ('ATR', Direction.__name__)
+    fields = ('High', 'Low', 'Close')
+
+    def __init__(self, period=10):
+        self.period = period
+        super().__init__(indicator.ATR(period=period))
+
+    def reset(self):
+        self.true_range_mean = _RollingMean(self.period)
+        self.close = float('nan')
+        self.atr = float('nan')
+
+    def true_range(self, high, low):
+        ranges = [utils.roundn(_, 4) for _ in (high - low, abs(high - self.close), abs(low - self.close))]
+        ranges = [_ for _ in ranges if not math.isnan(_)]
+        return max(ranges) if ranges else float('nan')
+
+    def __step__(self, high, low, close):
+        true_range = self.true_range(high, low)
+        seed = self.true_range_mean.push(true_range)
+        if math.isnan(self.atr):
+            self.atr = seed
+        else:
+            self.atr = (self.atr * (self.period - 1) + true_range) / self.period
+        self.close = close
+        return self.atr, ''
+
+    def get_state(self):
+        return {'true_range_mean': self.true_range_mean.get_state(), 'close': self.close, 'atr': self.atr}
+
+    def set_state(self, state):
+        self.true_range_mean.set_state(state['true_range_mean'])
+        self.close = state['close']
+        self.atr = state['atr']
+
+
+class StreamingDonchianChannel(StreamingIndicator):
+    columns = tuple(_.value for _ in indicator.DonchianChannel.Columns) + (Direction.__name__, )
+    fields = ('High', 'Low')
+
+    def __init__(self, high=50, low=50):
+        self.high = high
+        self.low = low
+        super().__init__(indicator.DonchianChannel(high=high, low=low))
+
+    def reset(self):
+        self.highest = _RollingExtreme(self.high, maximum=True)
+        self.lowest = _RollingExtreme(self.low, maximum=False)
+        self.prev_high = float('nan')
+        self.prev_low = float('nan')
+
+    def __step__(self, high, low):
+        high = self.highest.push(high)
+        low = self.lowest.push(low)
+        direction = _direction(self.prev_high < high and self.prev_low <= low,
+                               self.prev_low > low or self.prev_high > high)
+        self.prev_high = high
+        self.prev_low = low
+        return high, (high + low) / 2, low, direction
+
+    def get_state(self):
+        return {'highest': self.highest.get_state(), 'lowest': self.lowest.get_state(),
+                'prev_high': self.prev_high, 'prev_low': self.prev_low}
+
+    def set_state(self, state):
+        self.highest.set_state(state['highest'])
+        self.lowest.set_state(state['lowest'])
+        self.prev_high = state['prev_high']
+        self.prev_low = state['prev_low']
+
+
+STREAMING_CLASSES = {indicator.SMA: StreamingSMA, indicator.STDEV: StreamingSTDEV, indicator.EMA: StreamingEMA,
+                     indicator.ATR: StreamingATR, indicator.DonchianChannel: StreamingDonchianChannel}
+
+
+def create_streaming(runner):
+    """
+    Streaming counterpart of a runner with the same parameters, e.g. to keep an indicator current intraday.
+    """
+    streaming_class = STREAMING_CLASSES[runner.__class__]
+    parameters = [_ for _ in inspect.signature(streaming_class.__init__).parameters if _ != 'self']
+    return streaming_class(**dict((_, getattr(runner, _)) for _ in parameters))
@@ -1,6 +1,8 @@
 import os
 import traceback
+from enum import Enum
 
+import numpy as np
 import pandas as pd
 
 from poor_trader import config
@@ -9,7 +11,7 @@ from poor_trader import config
 def makedirs(path):
     if not os.path.exists(path):
         print('Creating directory', path)
-        os.makedirs(path)
+        os.makedirs(path, exist_ok=True)
 
 
 def load_equity_table(fpath):
@@ -18,6 +20,12 @@ def load_equity_table(fpath):
         return df
 
 
+class RoundingStage(Enum):
+    INDICATOR = 'Indicator'
+    EQUITY_CURVE = 'EquityCurve'
+    PERFORMANCE = 'Performance'
+
+
 def roundn(n, places=4):
     try:
         return float('%.{}f'.format(places) % n)
@@ -25,17 +33,94 @@ def roundn(n, places=4):
         return n
 
 
+def _round_values(values, places):
+    """
+    Vectorized roundn over a float array. Values whose scaled product lands within rounding error of a half, or
+    that are too large for an exact product, go through roundn so the result matches it exactly.
+    """
+    scale = 10. ** places
+    scaled = values * scale
+    rounded = np.round(scaled) / scale
+    with np.errstate(invalid='ignore'):
+        fraction = np.abs(scaled - np.trunc(scaled))
+        inexact = np.logical_or(np.abs(fraction - 0.5) <= np.abs(scaled) * 1e-12, np.abs(scaled) >= 2. ** 52)
+    for i in np.flatnonzero(inexact):
+        rounded[i] = roundn(values[i], places)
+    return rounded
+
+
 def _round(nseries, places=4):
     try:
-        return pd.Series([roundn(n, places) for n in nseries], nseries.index)
+        values = nseries.values
+        if values.dtype.kind in 'biuf':
+            return pd.Series(_round_values(values.astype(float), places), nseries.index)
+        values = np.empty(len(nseries.index), dtype=object)
+        values[:] = nseries.tolist()
+        numbers = np.array([isinstance(n, (float, int, np.number, np.bool_)) for n in values], dtype=bool)
+        if numbers.any():
+            values[numbers] = _round_values(values[numbers].astype(float), places)
+        return pd.Series(values.tolist(), nseries.index)
     except:
         return nseries
 
 
-def round_df(df, places=4):
+def round_df(df, places=4, stage=None, output=False):
+    """
+    Rounds the numeric values of df to places, leaving anything else as is. For a RoundingStage the places come
+    from config.ROUNDING_PLACES, and with config.ROUND_ON_OUTPUT_ONLY the stage keeps full precision in memory
+    and is only rounded when output=True, i.e. right before it is written out.
+    """
+    if stage is not None:
+        places = config.ROUNDING_PLACES.get(stage.value, places)
+        if places is None or (config.ROUND_ON_OUTPUT_ONLY and not output):
+            return df
     return df.apply(lambda x : _round(x, places))
 
 
+def _column_runs(df):
+    start = 0
+    dtypes = list(df.dtypes)
+    for stop in range(1, len(dtypes) + 1):
+        if stop == len(dtypes) or dtypes[stop] != dtypes[start]:
+            yield start, stop
+            start = stop
+
+
+def _is_writeable(values):
+    if not isinstance(values, np.ndarray):
+        return False
+    if not isinstance(values.base, np.ndarray):
+        return values.flags.writeable
+    # Copy-on-write pandas hands out read-only views of writeable arrays, so it is the arrays behind the view that count
+    while isinstance(values.base, np.ndarray):
+        values = values.base
+        if not values.flags.writeable:
+            return False
+    return True
+
+
+def _frozen_df(df, copy=True):
+    values = df.values.copy() if copy else df.values
+    values.setflags(write=False)
+    return pd.DataFrame(values, index=df.index, columns=df.columns, copy=False)
+
+
+def read_only_df(df, copy=True):
+    """
+    Rebuilds df around write-protected arrays, so writing through it or its row slices raises instead of silently
+    changing a shared original. A frame of one dtype wraps a single frozen df.values and a mixed frame joins one
+    frozen array per run of same-dtype columns. With copy=False a frame of one dtype freezes df.values without
+    copying where pandas hands out a view, for frames nobody else holds. A frame that is already read-only is
+    returned as is.
+    """
+    if not any(_is_writeable(df.iloc[:, i].values) for i in range(len(df.columns))):
+        return df
+    runs = list(_column_runs(df))
+    if len(runs) == 1:
+        return _frozen_df(df, copy=copy)
+    return pd.concat([_frozen_df(df.iloc[:, start:stop]) for start, stop in runs], axis=1, copy=False)
+
+
 def rindex(mylist, myvalue):
     return len(mylist) - mylist[::-1].index(myvalue) - 1
 
@@ -6,6 +6,7 @@ from poor_trader.screening import indicator
 from poor_trader import market, config
 from poor_trader.screening.entity import Direction
 from poor_trader.screening.indicator import DefaultIndicatorFactory, IndicatorRunnerFactory, DefaultIndicatorRunnerFactory
+from poor_trader.screening.store import get_store, IndicatorStore
 
 TEMP_INDICATORS_PATH = config.TEST_TEMP_PATH / 'indicators'
 
@@ -27,9 +28,11 @@ class TestIndicator(unittest.TestCase):
         atr_channel_indicator = factory.create(indicator.ATRChannel, top=runner.top, bottom=runner.bottom, sma=runner.sma)
         symbols = self.market.get_symbols()
         self.assertTrue(len(symbols) > 0)
+        expected_dir_path = factory.dir_path / runner.unique_name
+        self.assertEqual(sorted([config.INDICATOR_STORE_FILENAME, config.INDICATOR_STORE_INDEX_FILENAME]),
+                         sorted(os.listdir(expected_dir_path)))
         for symbol in symbols:
-            expected_path = (factory.dir_path / runner.unique_name) / '{}.{}'.format(symbol, config.PICKLE_EXTENSION)
-            self.assertTrue(os.path.exists(expected_path))
+            self.assertTrue(get_store(expected_dir_path).has(symbol))
         self.assertTrue(len(atr_channel_indicator.attributes) > 0, 'No attributes created.')
         attribute_keys = atr_channel_indicator.attributes.keys()
         self.assertTrue('Top' in attribute_keys)
@@ -47,14 +50,14 @@ class TestIndicator(unittest.TestCase):
         factory = DefaultIndicatorRunnerFactory(TEMP_INDICATORS_PATH)
         ema = factory.create(indicator.EMA, period=2)
         self.assertTrue(len(self.market.get_symbols()) > 0)
+        store = get_store(TEMP_INDICATORS_PATH / ema.unique_name)
+        sub_store = get_store(TEMP_INDICATORS_PATH / ema.unique_name.replace('EMA', 'SMA'))
         for symbol in self.market.get_symbols():
-            expected_pickle_path = (TEMP_INDICATORS_PATH / ema.unique_name) / '{}.{}'.format(symbol, config.PICKLE_EXTENSION)
-            expected_sub_pickle_path = (TEMP_INDICATORS_PATH / ema.unique_name.replace('ema', 'sma')) / '{}.{}'.format(symbol, config.PICKLE_EXTENSION)
-            self.assertFalse(os.path.exists(expected_pickle_path))
-            self.assertFalse(os.path.exists(expected_sub_pickle_path))
+            self.assertFalse(store.has(symbol))
+            self.assertFalse(sub_store.has(symbol))
             ema.run(symbol, self.market.get_quotes(symbol=symbol))
-            self.assertTrue(os.path.exists(expected_pickle_path))
-            self.assertTrue(os.path.exists(expected_sub_pickle_path))
+            self.assertTrue(store.has(symbol))
+            self.assertTrue(sub_store.has(symbol))
 
 
 class TestIndicatorRunner(unittest.TestCase):
@@ -75,6 +78,244 @@ class TestIndicatorRunner(unittest.TestCase):
             self.assertTrue(os.path.exists(expected_dir_path))
             self.assertIsNotNone(_indicator.get_attribute(Direction.__name__), msg=runner_class.__name__)
 
+    def test_panel_market_indicator_factory(self):
+        panel_market = market.csv_to_panel_market('TestMarket', INTRADAY_HISTORICAL_DATA_PATH)
+        expected = DefaultIndicatorFactory(TEMP_INDICATORS_PATH, self.market).create(indicator.MACross, fast=5, slow=10)
+        actual = DefaultIndicatorFactory(TEMP_INDICATORS_PATH, panel_market,
+                                         read_only=True).create(indicator.MACross, fast=5, slow=10)
+        for key in expected.get_attribute_keys():
+            for symbol in self.market.get_symbols():
+                self.assertListEqual(list(expected.get_attribute(key).get_value(symbol=symbol)),
+                                     list(actual.get_attribute(key).get_value(symbol=symbol)), msg=symbol)
+            with self.assertRaises(ValueError):
+                actual.get_attribute(key).get_value().iloc[0, 0] = 0
+
+    def test_processes(self):
+        expected = DefaultIndicatorFactory(TEMP_INDICATORS_PATH / 'serial', self.market).create(indicator.ATRChannel)
+        actual = DefaultIndicatorFactory(TEMP_INDICATORS_PATH, self.market, processes=2).create(indicator.ATRChannel)
+        for symbol in self.market.get_symbols():
+            self.assertTrue(get_store(TEMP_INDICATORS_PATH / actual.name).has(symbol))
+            self.assertIsNotNone(indicator.get_manifest(TEMP_INDICATORS_PATH).get(TEMP_INDICATORS_PATH / actual.name / symbol),
+                                 msg=symbol)
+        for key in expected.get_attribute_keys():
+            self.assertEqual(list(expected.get_attribute(key).get_value().columns),
+                             list(actual.get_attribute(key).get_value().columns))
+            self.assertEqual(expected.get_attribute(key).get_value().to_csv(),
+                             actual.get_attribute(key).get_value().to_csv(), msg=key)
+
+    def test_processes_float_parameter(self):
+        expected = DefaultIndicatorFactory(TEMP_INDICATORS_PATH / 'serial', self.market).create(
+            indicator.TrailingStops, multiplier=2.5, period=3)
+        actual = DefaultIndicatorFactory(TEMP_INDICATORS_PATH, self.market, processes=2).create(
+            indicator.TrailingStops, multiplier=2.5, period=3)
+        for key in expected.get_attribute_keys():
+            self.assertEqual(expected.get_attribute(key).get_value().to_csv(),
+                             actual.get_attribute(key).get_value().to_csv(), msg=key)
+
+    def test_attribute_builder(self):
+        builder = indicator.AttributeBuilder()
+        runner = indicator.SMA(period=5)
+        symbols = self.market.get_symbols()
+        for i, symbol in enumerate(symbols):
+            builder.add(symbol, runner.run(symbol, self.market.get_quotes(symbol=symbol).iloc[i * 10:]))
+        attributes = builder.build(read_only=True)
+        self.assertEqual(['SMA', Direction.__name__], list(attributes.keys()))
+        df_sma = attributes['SMA'].get_value()
+        self.assertEqual(symbols, list(df_sma.columns))
+        self.assertTrue(df_sma.index.is_monotonic_increasing)
+        for i, symbol in enumerate(symbols):
+            expected = runner.run(symbol, self.market.get_quotes(symbol=symbol).iloc[i * 10:]).SMA
+            self.assertEqual(str(list(expected)), str(list(df_sma[symbol].loc[expected.index])), msg=symbol)
+            self.assertTrue(df_sma[symbol].iloc[:i * 10].isnull().all(), msg=symbol)
+        with self.assertRaises(ValueError):
+            df_sma.iloc[0, 0] = 0
+        self.assertIs(df_sma, indicator.Attribute(df_sma, read_only=True).get_value())
+
+    def test_ema(self):
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            df_sma = indicator.SMA(period=10).run(symbol, df_quotes)
+            df_ema = indicator.EMA(period=10).run(symbol, df_quotes)
+            seed = df_sma.SMA.first_valid_index()
+            df_close = df_quotes.Close.loc[seed:].copy()
+            df_close.iloc[0] = df_sma.SMA.loc[seed]
+            expected = df_close.ewm(alpha=2. / 11., adjust=False).mean()
+            self.assertTrue(df_ema.EMA.loc[:seed].iloc[:-1].isnull().all(), msg=symbol)
+            self.assertTrue(((expected - df_ema.EMA.loc[seed:]).abs() < 1e-4).all(), msg=symbol)
+
+    def test_atr(self):
+        runner = indicator.ATR(period=3)
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            true_range = runner.true_range(df_quotes).true_range
+            atr = runner.run(symbol, df_quotes).ATR
+            self.assertEqual(2, atr.isnull().sum(), msg=symbol)
+            self.assertAlmostEqual(true_range.iloc[:3].mean(), atr.iloc[2], places=4)
+            expected = (atr.shift(1) * 2 + true_range) / 3
+            self.assertTrue(((expected - atr).iloc[3:].abs() < 1e-4).all(), msg=symbol)
+
+    def test_trailing_stops(self):
+        runner = indicator.TrailingStops(multiplier=2, period=3)
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            df = runner.run(symbol, df_quotes)
+            self.assertTrue(df.BuyStops.notnull().any() or df.SellStops.notnull().any(), msg=symbol)
+            self.assertFalse((df.BuyStops.notnull() & df.SellStops.notnull()).any(), msg=symbol)
+            sell_runs = df.SellStops.notnull() & df.SellStops.shift(1).notnull()
+            self.assertTrue((df.SellStops.diff()[sell_runs] >= 0).all(), msg=symbol)
+            buy_runs = df.BuyStops.notnull() & df.BuyStops.shift(1).notnull()
+            self.assertTrue((df.BuyStops.diff()[buy_runs] <= 0).all(), msg=symbol)
+
+    def test_price_volume_trend(self):
+        runner = indicator.PriceVolumeTrend(fast=2, slow=5)
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            df = runner.run(symbol, df_quotes)
+            expected = ((df_quotes.Close - df_quotes.Close.shift(1)) / df_quotes.Close.shift(1) * df_quotes.Volume).cumsum()
+            self.assertTrue(((expected - df.PVT).iloc[1:].abs() < 1e-4).all(), msg=symbol)
+            self.assertTrue(((df.PVT.rolling(5).mean() - df.SLOW_MA).iloc[5:].abs() < 1e-4).all(), msg=symbol)
+
+    def test_sma_bank(self):
+        periods = [1, 5, 40, 1000]
+        for symbol in self.market.get_symbols():
+            df_close = self.market.get_quotes(symbol=symbol).Close.copy()
+            df_close.iloc[50] = None
+            df_bank = indicator.sma_bank(df_close, periods)
+            self.assertEqual(periods, list(df_bank.columns))
+            self.assertTrue(df_bank.index.equals(df_close.index))
+            for period in periods:
+                expected = df_close.rolling(period).mean()
+                self.assertTrue((expected.isnull() == df_bank[period].isnull()).all(), msg=period)
+                self.assertListEqual(list(expected.dropna()), list(df_bank[period].dropna()), msg=period)
+
+    def test_trend_strength_sma(self):
+        factory = IndicatorRunnerFactory()
+        runner = factory.create(indicator.TrendStrength, start=5, end=40, step=5)
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            df = runner.run(symbol, df_quotes)
+            for period in runner.columns:
+                expected = factory.create(indicator.SMA, period=period).run(symbol, df_quotes)[runner.SMA_COLUMN]
+                actual = df['{}{}'.format(runner.SMA_COLUMN, period)]
+                self.assertListEqual(list(expected.fillna(0)), list(actual.fillna(0)), msg=symbol)
+
+    def test_run_panel(self):
+        quotes_panel = indicator.market_to_quotes_panel(self.market)
+        self.assertEqual(self.market.get_symbols(), quotes_panel.symbols)
+        factory = IndicatorRunnerFactory()
+        for runner in [factory.create(indicator.MACross, fast=5, slow=10), factory.create(indicator.STDEV),
+                       factory.create(indicator.DonchianChannel, high=10, low=5),
+                       factory.create(indicator.BollingerBand, period=5), factory.create(indicator.EMA, period=5),
+                       factory.create(indicator.ATR, period=3)]:
+            self.assertTrue(runner.has_panel_kernel())
+            for symbol, df in quotes_panel.unpack(runner.run_panel(quotes_panel)):
+                expected = runner.run(symbol, self.market.get_quotes(symbol=symbol))
+                self.assertListEqual(list(expected.index), list(df.index), msg=symbol)
+                self.assertEqual(expected.to_csv(), df.to_csv(), msg=runner.unique_name)
+        self.assertFalse(factory.create(indicator.MACD).has_panel_kernel())
+
+    def test_result_cache(self):
+        cache = indicator.IndicatorResultCache(max_size=3)
+        factory = DefaultIndicatorRunnerFactory(TEMP_INDICATORS_PATH, cache=cache)
+        symbol = self.market.get_symbols()[0]
+        df_quotes = self.market.get_quotes(symbol=symbol)
+        factory.create(indicator.MACross, fast=5, slow=10).run(symbol, df_quotes)
+        misses = cache.misses
+        sma = factory.create(indicator.SMA, period=5)
+        self.assertIs(sma.run(symbol, df_quotes), sma.run(symbol, df_quotes))
+        self.assertEqual(misses, cache.misses)
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(3, len(cache))
+        factory.create(indicator.SMA, period=20).run(symbol, df_quotes)
+        self.assertEqual(3, len(cache))
+        self.assertIsNone(cache.get((indicator.SMA(period=10).unique_name, symbol, indicator.quotes_fingerprint(df_quotes))))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+    def test_tail_update(self):
+        factory = DefaultIndicatorRunnerFactory(TEMP_INDICATORS_PATH, cache=indicator.IndicatorResultCache())
+        runner = factory.create(indicator.MACross, fast=5, slow=10)
+        self.assertEqual(10, runner.runner.get_lookback())
+        self.assertIsNone(indicator.EMA().get_lookback())
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            df_saved = runner.run(symbol, df_quotes.iloc[:-3]).copy()
+            # Marks a bar outside the lookback, which a tail update leaves alone
+            df_saved.iloc[0, 0] = -1.
+            runner.store.put(symbol, df_saved)
+            df = runner.run(symbol, df_quotes)
+            expected = indicator.MACross(fast=5, slow=10).run(symbol, df_quotes)
+            self.assertEqual(-1., df.iloc[0, 0], msg=symbol)
+            self.assertEqual(expected.iloc[1:].to_csv(), df.iloc[1:].to_csv(), msg=symbol)
+
+    def test_cache_manifest(self):
+        factory = DefaultIndicatorRunnerFactory(TEMP_INDICATORS_PATH, cache=indicator.IndicatorResultCache())
+        runner = factory.create(indicator.SMA, period=5)
+        symbol = self.market.get_symbols()[0]
+        df_quotes = self.market.get_quotes(symbol=symbol)
+        save_path = runner.get_save_path(symbol, df_quotes)
+        runner.run(symbol, df_quotes)
+        entry = factory.manifest.get(save_path)
+        self.assertEqual(runner.get_runner_key(), entry['runner'])
+        self.assertEqual(len(df_quotes.index), entry['rows'])
+        self.assertNotEqual(runner.get_runner_key(), factory.create(indicator.SMA, period=6).get_runner_key())
+
+        # Restated bars are detected instead of reusing the saved result
+        df_restated = df_quotes.copy()
+        df_restated.iloc[-1, df_restated.columns.get_loc('Close')] *= 2
+        self.assertIsNone(runner.load(symbol, df_restated, indicator.quotes_row_hashes(df_restated)))
+        expected = indicator.SMA(period=5).run(symbol, df_restated)
+        self.assertEqual(expected.to_csv(), runner.run(symbol, df_restated).to_csv())
+
+        factory.manifest.flush()
+        self.assertTrue(os.path.exists(factory.manifest.path))
+        self.assertEqual(factory.manifest.entries, indicator.IndicatorCacheManifest(TEMP_INDICATORS_PATH).entries)
+
+        factory.create(indicator.SMA, period=6).run(symbol, df_quotes)
+        self.addCleanup(setattr, factory.manifest, 'max_bytes', factory.manifest.max_bytes)
+        factory.manifest.max_bytes = runner.store.get_size(symbol)
+        factory.manifest.touch(save_path)
+        factory.manifest.flush()
+        self.assertTrue(runner.store.has(symbol))
+        self.assertEqual([factory.manifest.get_name(save_path)], list(factory.manifest.entries.keys()))
+        self.assertFalse(get_store(TEMP_INDICATORS_PATH / 'SMA_6_Close').has(symbol))
+
+    def test_code_version(self):
+        version = indicator.code_version(indicator.EMA)
+        self.addCleanup(indicator._code_versions.clear)
+        self.addCleanup(setattr, indicator, 'RESULT_KERNELS', indicator.RESULT_KERNELS)
+        indicator._code_versions.clear()
+        indicator.RESULT_KERNELS = indicator.RESULT_KERNELS[1:]
+        self.assertNotEqual(version, indicator.code_version(indicator.EMA))
+
+    def test_store(self):
+        store = get_store(TEMP_INDICATORS_PATH / 'store')
+        symbol = self.market.get_symbols()[0]
+        df_quotes = self.market.get_quotes(symbol=symbol)
+        df = indicator.DonchianChannel(high=10, low=5).run(symbol, df_quotes)
+        df['Label'] = ['bar {}'.format(_) for _ in range(len(df.index))]
+        store.put(symbol, df)
+        self.assertEqual(df.to_csv(), store.get(symbol).to_csv())
+        self.assertEqual(Direction.__name__, store.records[symbol]['columns'][-2][1])
+        self.assertEqual('pickle', store.records[symbol]['columns'][-1][1])
+        store.flush()
+        reader = IndicatorStore(store.dir_path)
+        self.assertEqual(df.to_csv(), reader.get(symbol).to_csv())
+        stale_reader = IndicatorStore(store.dir_path)
+        for _ in range(3):
+            store.put(symbol, df.iloc[:-1])
+        store.flush()
+        self.assertEqual(1, store.generation)
+        self.assertEqual(sorted([os.path.basename(store.data_path), config.INDICATOR_STORE_INDEX_FILENAME]),
+                         sorted(os.listdir(store.dir_path)))
+        self.assertEqual(store.get_size(symbol), os.path.getsize(store.data_path))
+        self.assertEqual(df.iloc[:-1].to_csv(), IndicatorStore(store.dir_path).get(symbol).to_csv())
+        # Readers of the old index keep the data they mapped or find it gone, but never read the compacted file
+        self.assertEqual(df.to_csv(), reader.get(symbol).to_csv())
+        self.assertIsNone(stale_reader.get(symbol))
+        store.remove(symbol)
+        self.assertIsNone(store.get(symbol))
+
     def test_is_unique_name_a_match(self):
         expected_values = {'DonchianChannel_100_50': indicator.DonchianChannel(100, 50),
                            'SMA_100_High': indicator.SMA(100, 'High'),
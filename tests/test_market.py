@@ -1,5 +1,12 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import time
 import unittest
 
+import numpy as np
 import pandas as pd
 from pandas.util.testing import assert_frame_equal
 
@@ -7,6 +14,14 @@ from poor_trader import market, config
 
 HISTORICAL_DATA_CSV_PATH = config.TEST_RESOURCES_PATH / 'historical_data.csv'
 
+MMAP_MARKET_PATH = config.TEST_TEMP_PATH / 'market'
+
+JSON_STOCKS_PATH = config.TEST_TEMP_PATH / 'json_stocks'
+
+SYMBOL_FILES_PATH = config.TEST_TEMP_PATH / 'symbols'
+
+INTRADAY_HISTORICAL_DATA_CSV_PATH = config.TEST_RESOURCES_PATH / 'intraday_historical_data.csv'
+
 
 def trim_symbol_from_columns(symbol, df):
     _df = df
@@ -93,5 +108,310 @@ class TestMarket(unittest.TestCase):
         assert_frame_equal(expected, actual)
 
 
+class TestTradingCalendar(unittest.TestCase):
+    def setUp(self):
+        self.df_historical_data = pd.read_csv(HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        self.calendar = market.df_to_calendar(self.df_historical_data)
+
+    def test_get_symbols(self):
+        for date in self.df_historical_data.index:
+            expected = [_[:-5] for _ in self.df_historical_data.filter(like='_Date').loc[date].dropna().index]
+            self.assertEqual(expected, self.calendar.get_symbols(date))
+        self.assertEqual([], self.calendar.get_symbols('2018-01-01'))
+
+    def test_get_dates_range(self):
+        dates = self.df_historical_data.index
+        self.assertListEqual(list(dates[1:4].values), list(self.calendar.get_dates(start=dates[1], end=dates[3])))
+        self.assertListEqual(list(dates[2:].values),
+                             list(self.calendar.get_dates(start=dates[1] + pd.Timedelta(hours=1))))
+        bh_dates = self.df_historical_data['BH_Date'].dropna().index.values
+        self.assertListEqual(list(bh_dates), list(self.calendar.get_dates(symbols=['BH'])))
+
+    def test_get_rows_partial_date(self):
+        df_historical_data = pd.read_csv(INTRADAY_HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        calendar = market.df_to_calendar(df_historical_data)
+        expected = df_historical_data.loc['2018-03-16':'2018-03-16'].index
+        self.assertListEqual(list(expected), list(calendar.dates[calendar.get_rows(date='2018-03-16')]))
+        self.assertListEqual(list(expected), list(calendar.dates[calendar.get_rows(end='2018-03-16')]))
+        self.assertEqual(df_historical_data.loc['2018-03-16':'2018-03-16', 'CEB_Close'].iloc[0],
+                         market.df_to_panel_market('TestMarket', df_historical_data)
+                         .get_close('2018-03-16').iloc[0]['CEB_Close'])
+
+
+class TestPanelMarket(unittest.TestCase):
+    def setUp(self):
+        self.df_market = market.csv_to_market('TestMarket', HISTORICAL_DATA_CSV_PATH)
+        self.market = market.csv_to_panel_market('TestMarket', HISTORICAL_DATA_CSV_PATH)
+        self.date = self.df_market.get_dates()[0]
+
+    def test_get_dates(self):
+        self.assertListEqual(list(self.df_market.get_dates()), list(self.market.get_dates()))
+        self.assertListEqual(list(self.df_market.get_dates(symbols=['BH', 'BLFI'])),
+                             list(self.market.get_dates(symbols=['BH', 'BLFI'])))
+
+    def test_get_symbols(self):
+        self.assertEqual(self.df_market.get_symbols(), self.market.get_symbols())
+        for date in self.df_market.get_dates():
+            self.assertEqual(self.df_market.get_symbols(date), self.market.get_symbols(date))
+
+    def test_get_quotes_symbol(self):
+        for symbol in self.df_market.get_symbols():
+            expected = self.df_market.get_quotes(symbol=symbol).drop(columns=['Date']).astype(float)
+            actual = self.market.get_quotes(symbol=symbol)
+            assert_frame_equal(expected, actual, check_names=False)
+
+    def test_get_close(self):
+        self.assertEqual(16.9, self.market.get_close(self.date, '2GO'))
+        self.assertTrue(self.market.get_close(self.date, 'BH').empty)
+        expected = self.df_market.get_close(symbol='BH').astype(float)
+        assert_frame_equal(expected, self.market.get_close(symbol='BH'), check_names=False)
+
+    def test_get_open_date(self):
+        expected = self.df_market.get_open(self.date).astype(float)
+        actual = self.market.get_open(self.date)
+        assert_frame_equal(expected, actual, check_names=False)
+
+    def test_append_bars(self):
+        df_historical_data = pd.read_csv(HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        panel_market = market.df_to_panel_market('TestMarket', df_historical_data.iloc[:2])
+        df_market = market.DataFrameMarket(df_historical_data.iloc[:2])
+        for _market in [panel_market, df_market]:
+            appended = _market.append_bars(df_historical_data.iloc[2:])
+            self.assertEqual((df_historical_data.index[2], df_historical_data.index[-1]), appended)
+            self.assertListEqual(list(self.market.get_dates()), list(_market.get_dates()))
+            self.assertEqual(self.market.get_symbols(appended[1]), _market.get_symbols(appended[1]))
+        assert_frame_equal(self.market.get_quotes(), panel_market.get_quotes())
+        self.assertListEqual(list(df_historical_data.columns), list(df_market.get_quotes().columns))
+
+    def test_append_bars_without_dates(self):
+        df_historical_data = pd.read_csv(HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        df_new_bars = df_historical_data.iloc[2:].drop(df_historical_data.filter(like='_Date').columns, axis=1)
+        panel_market = market.df_to_panel_market('TestMarket', df_historical_data.iloc[:2])
+        df_market = market.DataFrameMarket(df_historical_data.iloc[:2])
+        for _market in [panel_market, df_market]:
+            appended = _market.append_bars(df_new_bars)
+            self.assertListEqual(list(panel_market.get_dates()), list(_market.get_dates()))
+            self.assertEqual(panel_market.get_symbols(appended[1]), _market.get_symbols(appended[1]))
+            self.assertLess(0, len(_market.get_symbols(appended[1])))
+        for symbol in panel_market.get_symbols():
+            self.assertListEqual(list(panel_market.get_quotes(symbol=symbol).Close),
+                                 list(df_market.get_quotes(symbol=symbol).Close), msg=symbol)
+
+    def test_compact(self):
+        compact_market = market.csv_to_panel_market('TestMarket', HISTORICAL_DATA_CSV_PATH, compact=True)
+        self.assertLess(compact_market.memory_usage().sum(), self.market.memory_usage().sum())
+        self.assertLess(self.market.memory_usage().sum(), self.df_market.memory_usage().sum())
+        for symbol in self.market.get_symbols():
+            expected = self.market.get_quotes(symbol=symbol)
+            actual = compact_market.get_quotes(symbol=symbol)
+            self.assertEqual('float32', actual.Close.dtype)
+            self.assertEqual('int64', actual.Volume.dtype)
+            self.assertListEqual(list(expected.index), list(actual.index))
+            self.assertListEqual(list(expected.columns), list(actual.columns))
+            np.testing.assert_allclose(expected.values, actual.values.astype(np.float64), rtol=1e-6)
+        self.assertTrue(pd.isnull(compact_market.get_volume(self.date)['BH_Volume'].iloc[0]))
+        close = compact_market.get_close(self.date, '2GO')
+        self.assertIsInstance(close, float)
+        self.assertAlmostEqual(16.9, close, places=5)
+        self.assertEqual(np.float64, compact_market.snapshot(self.date).close.dtype)
+
+    def test_trim(self):
+        dates = self.market.get_dates()
+        trimmed = self.market.trim(start=dates[2])
+        self.assertListEqual(list(dates[2:]), list(trimmed.get_dates()))
+        self.assertEqual(self.market.get_symbols(dates[3]), trimmed.get_symbols(dates[3]))
+
+    def test_snapshot(self):
+        for date in self.df_market.get_dates():
+            expected = self.df_market.snapshot(date)
+            actual = self.market.snapshot(date)
+            self.assertEqual(self.market.get_symbols(date), actual.symbols)
+            self.assertEqual(expected.symbols, actual.symbols)
+            for field in ['open', 'high', 'low', 'close', 'volume']:
+                self.assertListEqual(list(getattr(expected, field)), list(getattr(actual, field)))
+        snapshot = self.market.snapshot(self.date)
+        self.assertEqual(16.9, snapshot.get_close('2GO'))
+        self.assertTrue(np.isnan(snapshot.get_close('BH')))
+        self.assertIs(snapshot, self.market.snapshot(self.date))
+        self.assertEqual(0, len(self.market.snapshot('2018-01-01')))
+
+    def test_resample(self):
+        df_historical_data = pd.read_csv(INTRADAY_HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        panel_market = market.df_to_panel_market('TestMarket', df_historical_data)
+        df_market = market.DataFrameMarket(df_historical_data)
+        aggregations = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum',
+                        'BoardLot': 'last'}
+        for rule in ['D', 'W']:
+            for symbol in panel_market.get_symbols():
+                df_quotes = panel_market.get_quotes(symbol=symbol)
+                expected = df_quotes.resample(rule).agg(aggregations)
+                expected = expected[df_quotes.Close.resample(rule).count() > 0]
+                self.assertListEqual(list(expected.index), list(panel_market.resample(rule).get_dates([symbol])))
+                np.testing.assert_array_equal(expected.values, panel_market.resample(rule).get_quotes(symbol=symbol))
+                np.testing.assert_array_equal(expected.values,
+                                              df_market.resample(rule).get_quotes(symbol=symbol)[expected.columns])
+        self.assertIs(panel_market.resample('D'), panel_market.resample('D'))
+
+    def test_read_only(self):
+        read_only_market = market.csv_to_panel_market('TestMarket', HISTORICAL_DATA_CSV_PATH, read_only=True)
+        df_market = market.csv_to_market('TestMarket', HISTORICAL_DATA_CSV_PATH, read_only=True)
+        df_quotes = read_only_market.get_quotes(symbol='2GO')
+        assert_frame_equal(self.market.get_quotes(symbol='2GO'), df_quotes)
+        self.assertFalse(read_only_market.__values__['Close'].flags.writeable)
+        self.assertEqual(16.9, df_market.get_close(self.date, '2GO'))
+        for df in [df_quotes, df_market.get_quotes(date=self.date)]:
+            try:
+                df.loc[df.index[0], df.filter(like='Close').columns[0]] = 0
+            except ValueError:
+                pass
+        for _market in [read_only_market, df_market]:
+            self.assertEqual(16.9, _market.get_close(self.date, '2GO'))
+            self.assertEqual(16.9, _market.get_quotes(symbol='2GO').Close.iloc[0])
+
+
+class TestMmapMarket(unittest.TestCase):
+    def setUp(self):
+        self.tearDown()
+        self.panel_market = market.csv_to_panel_market('TestMarket', HISTORICAL_DATA_CSV_PATH)
+        market.market_to_mmap(self.panel_market, MMAP_MARKET_PATH)
+        self.market = market.mmap_to_market(None, MMAP_MARKET_PATH)
+
+    def tearDown(self):
+        if os.path.exists(config.TEST_TEMP_PATH):
+            shutil.rmtree(config.TEST_TEMP_PATH)
+
+    def test_mmap_to_market(self):
+        self.assertEqual('TestMarket', self.market.name)
+        self.assertListEqual(list(self.panel_market.get_dates()), list(self.market.get_dates()))
+        assert_frame_equal(self.panel_market.get_quotes(), self.market.get_quotes())
+        for symbol in self.panel_market.get_symbols():
+            assert_frame_equal(self.panel_market.get_quotes(symbol=symbol), self.market.get_quotes(symbol=symbol))
+
+    def test_append_bars(self):
+        df_historical_data = pd.read_csv(HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        market.market_to_mmap(market.df_to_panel_market('TestMarket', df_historical_data.iloc[:3]), MMAP_MARKET_PATH)
+        appended = market.append_bars_to_mmap(MMAP_MARKET_PATH, df_historical_data.iloc[3:])
+        self.assertEqual((df_historical_data.index[3], df_historical_data.index[-1]), appended)
+        appended_market = market.mmap_to_market(None, MMAP_MARKET_PATH)
+        assert_frame_equal(self.panel_market.get_quotes(), appended_market.get_quotes())
+        with self.assertRaises(ValueError):
+            market.append_bars_to_mmap(MMAP_MARKET_PATH, df_historical_data.iloc[3:])
+
+    def test_read_only(self):
+        close = self.market.__values__['Close']
+        self.assertFalse(close.flags.writeable)
+        with self.assertRaises(ValueError):
+            close[0, 0] = 0
+
+
+class TestLazyMarket(unittest.TestCase):
+    def setUp(self):
+        self.tearDown()
+        self.df_market = market.csv_to_market('TestMarket', HISTORICAL_DATA_CSV_PATH)
+        market.df_to_symbol_files(pd.read_csv(HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0),
+                                  SYMBOL_FILES_PATH)
+        self.market = market.symbol_files_to_market('TestMarket', SYMBOL_FILES_PATH, cache_size=2)
+        self.date = self.df_market.get_dates()[0]
+
+    def tearDown(self):
+        if os.path.exists(config.TEST_TEMP_PATH):
+            shutil.rmtree(config.TEST_TEMP_PATH)
+
+    def test_get_dates_symbols(self):
+        self.assertListEqual(list(self.df_market.get_dates()), list(self.market.get_dates()))
+        self.assertEqual(self.df_market.get_symbols(), self.market.get_symbols())
+        self.assertEqual(self.df_market.get_symbols(self.date), self.market.get_symbols(self.date))
+        self.assertEqual([], self.market.get_cached_symbols())
+
+    def test_get_quotes_symbol(self):
+        for symbol in ['2GO', 'BH', 'BLFI']:
+            assert_frame_equal(self.df_market.get_quotes(symbol=symbol), self.market.get_quotes(symbol=symbol))
+        self.assertEqual(['BH', 'BLFI'], self.market.get_cached_symbols())
+        self.assertEqual(16.9, self.market.get_close(self.date, '2GO'))
+        self.assertEqual(['BLFI', '2GO'], self.market.get_cached_symbols())
+
+    def test_symbols(self):
+        lazy_market = market.symbol_files_to_market('TestMarket', SYMBOL_FILES_PATH, symbols=['2GO', 'BH'])
+        self.assertEqual(['2GO'], lazy_market.get_symbols(self.date))
+        expected = self.df_market.get_close().filter(items=['2GO_Close', 'BH_Close']).dropna(how='all')
+        actual = lazy_market.get_close()
+        self.assertListEqual(list(expected.index), list(actual.index))
+        self.assertListEqual(list(expected.columns), list(actual.columns))
+        np.testing.assert_array_equal(expected.values, actual.values)
+        self.assertEqual([], lazy_market.get_cached_symbols())
+        self.assertEqual(16.9, lazy_market.snapshot(self.date).get_close('2GO'))
+
+    def test_wide_getters_keep_cache(self):
+        self.market.get_quotes(symbol='BH')
+        self.market.get_quotes(symbol='BLFI')
+        expected = self.df_market.get_close()
+        actual = self.market.get_close()
+        self.assertListEqual(list(expected.index), list(actual.index))
+        np.testing.assert_array_equal(expected.values, actual[expected.columns].values)
+        self.assertEqual(16.9, self.market.snapshot(self.date).get_close('2GO'))
+        self.assertEqual(['BH', 'BLFI'], self.market.get_cached_symbols())
+
+    def test_update_symbol_files(self):
+        pkl_path = config.TEST_TEMP_PATH / 'historical_data.pkl'
+        df_historical_data = pd.read_csv(HISTORICAL_DATA_CSV_PATH, parse_dates=True, index_col=0)
+        df_historical_data.iloc[:3].to_pickle(pkl_path)
+        self.assertTrue(market.update_symbol_files(pkl_path, SYMBOL_FILES_PATH))
+        self.assertFalse(market.update_symbol_files(pkl_path, SYMBOL_FILES_PATH))
+        self.assertEqual(3, len(market.symbol_files_to_market('TestMarket', SYMBOL_FILES_PATH).get_dates()))
+        df_historical_data.to_pickle(pkl_path)
+        os.utime(pkl_path, (time.time() + 10, time.time() + 10))
+        self.assertTrue(market.symbol_files_outdated(pkl_path, SYMBOL_FILES_PATH))
+        self.assertTrue(market.update_symbol_files(pkl_path, SYMBOL_FILES_PATH))
+        self.assertEqual(5, len(market.symbol_files_to_market('TestMarket', SYMBOL_FILES_PATH).get_dates()))
+
+    def test_trim(self):
+        dates = self.df_market.get_dates()
+        trimmed = self.market.trim(start=dates[2])
+        self.assertListEqual(list(dates[2:]), list(trimmed.get_dates()))
+        assert_frame_equal(self.df_market.get_quotes(symbol='2GO', start=dates[2]), trimmed.get_quotes(symbol='2GO'))
+
+
+class TestJsonMarket(unittest.TestCase):
+    def setUp(self):
+        self.tearDown()
+        self.market = market.csv_to_market('TestMarket', INTRADAY_HISTORICAL_DATA_CSV_PATH)
+        os.makedirs(JSON_STOCKS_PATH)
+        for symbol in self.market.get_symbols():
+            df_quotes = self.market.get_quotes(symbol=symbol)
+            quotes = {'t': [int(time.mktime(_.timetuple())) for _ in df_quotes.index],
+                      'o': list(df_quotes.Open), 'h': list(df_quotes.High), 'l': list(df_quotes.Low),
+                      'c': list(df_quotes.Close), 'v': list(df_quotes.Volume)}
+            with open(JSON_STOCKS_PATH / '{}.json'.format(symbol), 'w') as f:
+                json.dump(quotes, f)
+
+    def tearDown(self):
+        if os.path.exists(config.TEST_TEMP_PATH):
+            shutil.rmtree(config.TEST_TEMP_PATH)
+
+    def test_json_files_directory_to_market(self):
+        json_market = market.json_files_directory_to_market('JsonMarket', JSON_STOCKS_PATH, processes=2)
+        self.assertEqual(sorted(self.market.get_symbols()), sorted(json_market.get_symbols()))
+        self.assertListEqual(list(self.market.get_dates()), list(json_market.get_dates()))
+        for symbol in self.market.get_symbols():
+            expected = self.market.get_quotes(symbol=symbol).filter(items=['Open', 'High', 'Low', 'Close', 'Volume'])
+            actual = json_market.get_quotes(symbol=symbol).filter(items=['Open', 'High', 'Low', 'Close', 'Volume'])
+            assert_frame_equal(expected, actual, check_dtype=False, check_names=False)
+
+    def test_read_json_file_duplicates(self):
+        t = int(time.mktime(pd.Timestamp('2018-03-16 09:00:00').timetuple()))
+        quotes = {'t': [t, t + 60, t + 3600], 'o': [1.0, 2.0, 3.0], 'h': [1.0, 2.0, 3.0], 'l': [1.0, 2.0, 3.0],
+                  'c': [1.0, 2.0, 3.0], 'v': [10, 20, 30]}
+        json_path = JSON_STOCKS_PATH / 'DUP.json'
+        with open(json_path, 'w') as f:
+            json.dump(quotes, f)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            df_quotes = market.read_json_file(json_path)
+        self.assertListEqual([pd.Timestamp('2018-03-16 09:00:00'), pd.Timestamp('2018-03-16 10:00:00')],
+                             list(df_quotes.index))
+        self.assertListEqual([2.0, 3.0], list(df_quotes.Close))
+        self.assertIn('2018-03-16 09:00:00', stdout.getvalue())
+
+
 if __name__ == '__main__':
     unittest.main()
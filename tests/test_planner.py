@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from poor_trader import market, config
+from poor_trader.screening import indicator, strategy
+from poor_trader.screening.planner import IndicatorPlanner
+from tests import test_indicator
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.tearDown()
+        self.market = market.csv_to_market('TestMarket', test_indicator.INTRADAY_HISTORICAL_DATA_PATH)
+        self.indicator_factory = indicator.DefaultIndicatorFactory(test_indicator.TEMP_INDICATORS_PATH, self.market)
+        self.planner = IndicatorPlanner(self.indicator_factory)
+
+    def tearDown(self):
+        if os.path.exists(config.TEST_TEMP_PATH):
+            shutil.rmtree(config.TEST_TEMP_PATH)
+
+    def test_plan(self):
+        dc = strategy.DonchianChannel(self.planner, high=10, low=10, fast=5, slow=10)
+        atr = strategy.ATRChannelBreakout(self.planner, sma=5, fast=5, slow=10)
+        self.assertFalse(os.path.exists(test_indicator.TEMP_INDICATORS_PATH))
+        self.assertIs(dc.indicators[1], atr.indicators[1])
+
+        plan = [node.name for node in self.planner.get_plan()]
+        self.assertEqual(len(set(plan)), len(plan))
+        self.assertEqual(['DonchianChannel_10_10', 'SMA_5_Close', 'SMA_10_Close', 'MACross_5_10', 'ATR_7', 'ATR_3',
+                          'ATRChannel_7_3_5'], plan)
+        report = self.planner.report()
+        self.assertIn('MACross_5_10 <- SMA_5_Close, SMA_10_Close [requested]', report)
+
+        with self.assertRaises(RuntimeError):
+            dc.indicators[1].attributes
+        self.planner.execute()
+        self.assertTrue(self.planner.is_executed())
+        for name in plan:
+            self.assertTrue(os.path.exists(test_indicator.TEMP_INDICATORS_PATH / name), msg=name)
+        expected = self.indicator_factory.create(indicator.MACross, fast=5, slow=10)
+        for symbol in self.market.get_symbols():
+            self.assertListEqual(list(expected.get_attribute('Direction').get_value(symbol=symbol)),
+                                 list(dc.indicators[1].get_attribute('Direction').get_value(symbol=symbol)))
+
+    def test_execute_on_first_use(self):
+        ts = strategy.TrendStrength(self.planner, start=5, end=10, step=1, fast=5, slow=10)
+        self.assertFalse(self.planner.is_executed())
+        self.assertIsNotNone(ts.indicators[0].get_attribute('TrendStrength'))
+        self.assertTrue(self.planner.is_executed())
+        self.assertIn('[done]', self.planner.report())
+
+    def test_run_once(self):
+        indicator.RESULT_CACHE.clear()
+        runs = []
+
+        def count(method):
+            def counted(runner, *args, **kwargs):
+                runs.append((runner.unique_name, method.__name__))
+                return method(runner, *args, **kwargs)
+            return counted
+
+        with mock.patch.object(indicator.ATR, 'run', count(indicator.ATR.run)), \
+                mock.patch.object(indicator.ATR, 'run_panel', count(indicator.ATR.run_panel)), \
+                mock.patch.object(indicator.SMA, 'run', count(indicator.SMA.run)), \
+                mock.patch.object(indicator.SMA, 'run_panel', count(indicator.SMA.run_panel)):
+            self.planner.create(indicator.ATRChannel, top=7, bottom=3, sma=20)
+            self.planner.create(indicator.MACross, fast=5, slow=20)
+            self.planner.execute()
+        symbols = len(self.market.get_symbols())
+        self.assertEqual(symbols, runs.count(('ATR_7', 'run')))
+        self.assertEqual(symbols, runs.count(('ATR_3', 'run')))
+        self.assertEqual(symbols, runs.count(('SMA_20_Close', 'run')))
+        self.assertEqual(1, runs.count(('SMA_5_Close', 'run_panel')))
+        self.assertEqual(1, runs.count(('SMA_20_Close', 'run_panel')))
+        self.assertEqual(0, len([_ for _ in runs if _[0].startswith('ATR_') and _[1] == 'run_panel']))
+        self.assertEqual(0, runs.count(('SMA_5_Close', 'run')))
+
+    def test_run_runner(self):
+        runner = self.indicator_factory.runner_factory.create(indicator.SMA, period=5)
+        self.indicator_factory.run_runner(runner)
+        with open(test_indicator.TEMP_INDICATORS_PATH / config.INDICATOR_MANIFEST_FILENAME) as f:
+            manifest = json.load(f)
+        self.assertTrue(any(name.startswith(runner.unique_name + os.sep) for name in manifest))
+
+
+if __name__ == '__main__':
+    unittest.main()
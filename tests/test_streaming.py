@@ -0,0 +1,64 @@
+import json
+import unittest
+
+import pandas as pd
+
+from poor_trader import market, config
+from poor_trader.screening import indicator, streaming
+from poor_trader.screening.entity import Direction
+
+INTRADAY_HISTORICAL_DATA_PATH = config.TEST_RESOURCES_PATH / 'intraday_historical_data.csv'
+TOLERANCE = 1e-9
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.market = market.csv_to_market('TestMarket', INTRADAY_HISTORICAL_DATA_PATH)
+        self.runners = [indicator.SMA(period=5), indicator.STDEV(period=5), indicator.EMA(period=5),
+                        indicator.ATR(period=3), indicator.DonchianChannel(high=10, low=5)]
+
+    def test_seed(self):
+        for runner in self.runners:
+            for symbol in self.market.get_symbols():
+                df_quotes = self.market.get_quotes(symbol=symbol)
+                expected = runner.run(symbol, df_quotes)
+                self.assertEqual(expected.to_csv(), streaming.create_streaming(runner).seed(df_quotes).to_csv(),
+                                 msg=runner.unique_name)
+
+    def test_update(self):
+        for runner in self.runners:
+            for symbol in self.market.get_symbols():
+                df_quotes = self.market.get_quotes(symbol=symbol)
+                expected = runner.run(symbol, df_quotes)
+                stream = streaming.create_streaming(runner)
+                self.assertEqual(runner.unique_name, stream.unique_name)
+                cut = len(df_quotes.index) // 2
+                stream.seed(df_quotes.iloc[:cut])
+                # Restored from a snapshot, e.g. after a restart
+                restored = streaming.create_streaming(runner)
+                restored.set_state(json.loads(json.dumps(stream.get_state())))
+                rows = [restored.update(df_quotes.iloc[i]) for i in range(cut, len(df_quotes.index))]
+                self.assertEqual(expected.iloc[cut:].to_csv(), pd.DataFrame(rows).to_csv(), msg=runner.unique_name)
+                self.assertEqual(list(expected.columns), list(rows[-1].index))
+                self.assertIn(rows[-1][Direction.__name__], ['', Direction.LONG, Direction.SHORT])
+
+    def test_direction_ties(self):
+        # The streaming kernels follow pandas >= 1.x rolling sums, and other pandas versions can differ from them
+        # by up to TOLERANCE. Both sides take Direction from their unrounded values, so it is only compared where
+        # the price is further than TOLERANCE from the value; the values themselves match once rounded.
+        df_quotes = pd.DataFrame({'Close': [2.68, 2.11, 2.28, 1.37, 2.11, 2.5, 1.9]},
+                                 index=pd.date_range('2018-03-16', periods=7, freq='D'))
+        for runner, df_values in [(indicator.SMA(period=5), df_quotes.Close.rolling(5).mean()),
+                                  (indicator.STDEV(period=5), df_quotes.Close.rolling(5).std())]:
+            expected = runner.run('TIE', df_quotes)
+            actual = streaming.create_streaming(runner).seed(df_quotes)
+            for col in expected.columns:
+                if col != Direction.__name__:
+                    self.assertEqual(expected[col].to_csv(), actual[col].to_csv(), msg=runner.unique_name)
+            apart = ((df_quotes.Close - df_values).abs() > TOLERANCE).values
+            self.assertListEqual(list(expected[Direction.__name__][apart]), list(actual[Direction.__name__][apart]),
+                                 msg=runner.unique_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.util.testing import assert_frame_equal
+
+from poor_trader import utils, config
+from poor_trader.screening.entity import Direction
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({'Float': [1.23456, 0.00015, np.nan, 1e20],
+                                'Int': [1, 2, 3, 4],
+                                'Direction': [Direction.LONG, '', Direction.SHORT, 2.000049]})
+
+    def tearDown(self):
+        config.ROUND_ON_OUTPUT_ONLY = False
+
+    def test_round_df(self):
+        df = utils.round_df(self.df)
+        for col in self.df.columns:
+            expected = [utils.roundn(_) for _ in self.df[col]]
+            self.assertEqual(str(expected), str(df[col].tolist()), msg=col)
+        self.assertEqual('float64', df.Int.dtype)
+        self.assertEqual([1.23, 0.0], list(utils.round_df(self.df, places=2).Float.iloc[:2]))
+
+    def test_round_df_stage(self):
+        df = utils.round_df(self.df, stage=utils.RoundingStage.PERFORMANCE)
+        self.assertEqual(1.23, df.Float.iloc[0])
+        config.ROUND_ON_OUTPUT_ONLY = True
+        self.assertIs(self.df, utils.round_df(self.df, stage=utils.RoundingStage.INDICATOR))
+        df = utils.round_df(self.df, stage=utils.RoundingStage.INDICATOR, output=True)
+        self.assertEqual(1.2346, df.Float.iloc[0])
+
+    def test_read_only_df(self):
+        df = pd.DataFrame({'Float': [1.0, 2.0], 'Object': ['a', 'b'], 'Int': [1, 2]},
+                          columns=['Float', 'Object', 'Int'])
+        for expected in [df, df[['Float']]]:
+            actual = utils.read_only_df(expected)
+            assert_frame_equal(expected, actual)
+            self.assertFalse(any(utils._is_writeable(actual[col].values) for col in actual.columns))
+            self.assertIs(actual, utils.read_only_df(actual))
+
+
+if __name__ == '__main__':
+    unittest.main()